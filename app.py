@@ -26,11 +26,12 @@ def get_recommendations():
     count = data.get('count', 5)
     
     try:
-        # First check if the title exists in our dataset
-        if title not in data_manager.data['title'].values:
+        # First check if the title exists in our dataset, ignoring case and punctuation
+        correct_title = data_manager.find_title(title) if isinstance(title, str) else None
+        if correct_title is None:
             return jsonify({'error': f'Title "{title}" not found in our database'}), 404
             
-        similar_content = recommender.find_similar_content(title, count)
+        similar_content = recommender.find_similar_content(correct_title, count)
         # Convert the list of tuples to a list of titles for the frontend
         recommendations = [title for title, _ in similar_content]
         return jsonify({'recommendations': recommendations})
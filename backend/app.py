@@ -1,9 +1,20 @@
-from flask import Flask, request, jsonify
+from collections import namedtuple
+from concurrent.futures import TimeoutError as ScoringTimeoutError
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+import json
 import os
+import time
 from data_manager import DataManager
+import instrumentation
+from instrumentation import span
+from parallel_scoring import ParallelScorer
 from recommender import ContentRecommender
+from response_cache import RecommendationCache
+from scoring_pool import PoolSaturatedError, ScoringPool
 from similarity import SimilarityCalculator
+import similarity_engines
+from title_index import normalize_title
 
 app = Flask(__name__)
 CORS(app)
@@ -14,67 +25,358 @@ movies_path = os.path.join(current_dir, 'movies.csv')
 shows_path = os.path.join(current_dir, 'tv_shows.csv')
 
 # Initialize components
-data_manager = DataManager(movies_path=movies_path, shows_path=shows_path)
+# RECOMMENDER_COMPACT=1 keeps only the columns used for serving, in a compact form
+data_manager = DataManager(movies_path=movies_path, shows_path=shows_path,
+                           compact=os.environ.get('RECOMMENDER_COMPACT') == '1')
+data_manager.load_all()  # Parse and index both catalogs once at startup
+# The combined catalog of both content types copies their frames and feature
+# matrices, so it is only built by the first request that needs it
 similarity_calculator = SimilarityCalculator()
-recommender = ContentRecommender(data_manager, similarity_calculator)
+# Full scans of large catalogs are split across cores; configured by
+# RECOMMENDER_PARALLEL_* variables, and serial for catalogs below the threshold
+# Requests pick a similarity engine by name, defaulting to RECOMMENDER_SIMILARITY_ENGINE
+recommender = ContentRecommender(data_manager, similarity_calculator, use_neighbor_table=True,
+                                 parallel_scorer=ParallelScorer.from_env(),
+                                 engines=similarity_engines.available_engines(),
+                                 default_engine=similarity_engines.default_engine_name())
+recommender.get_engine()  # Fail at startup if the configured default engine is unavailable
+
+# CPU-heavy scoring runs on a bounded pool, configured by RECOMMENDER_SCORING_* variables
+scoring_pool = ScoringPool.from_env()
+
+# Results of popular titles are served from cache until the catalog changes;
+# configured by RECOMMENDER_CACHE_* variables
+recommendation_cache = RecommendationCache.from_env()
+data_manager.add_reload_listener(recommendation_cache.invalidate)
+
+# Request metrics served on /metrics alongside the per-stage histograms
+request_seconds = instrumentation.registry.histogram(
+    'recommender_request_seconds', 'Latency of HTTP requests by endpoint.', ('endpoint',)
+)
+requests_total = instrumentation.registry.counter(
+    'recommender_requests_total', 'HTTP requests by endpoint and status code.', ('endpoint', 'status')
+)
+
+# Requests carrying this header get a Server-Timing header with their stage breakdown
+PROFILE_HEADER = 'X-Profile'
+
+def collect_cache_metrics():
+    """Response cache counters in the Prometheus text format."""
+    stats = recommendation_cache.stats()
+    lines = []
+    for name in ('hits', 'misses', 'evictions'):
+        metric = f'recommender_cache_{name}_total'
+        lines += [f'# HELP {metric} Response cache {name}.', f'# TYPE {metric} counter',
+                  f'{metric} {stats[name]}']
+    lines += ['# HELP recommender_cache_entries Entries in the response cache.',
+              '# TYPE recommender_cache_entries gauge',
+              f"recommender_cache_entries {stats['entries']}"]
+    return lines
+
+instrumentation.registry.add_collector(collect_cache_metrics)
+
+# Batch requests: titles scored per matrix product, the batch size above which
+# results are streamed as NDJSON, and the largest batch accepted
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+SUGGESTION_COUNT = 5
+BATCH_BLOCK_SIZE = 256
+BATCH_STREAM_THRESHOLD = 100
+MAX_BATCH_TITLES = 10000
+COUNT_ERROR = 'Provide the number of recommendations as a positive whole number in "count".'
+
+def is_valid_count(count):
+    """Whether a requested recommendation count is a positive int (bools are rejected)."""
+    return isinstance(count, int) and not isinstance(count, bool) and count >= 1
+
+def score_similar_content(title, count, content_type, result_type=None, engine=None):
+    """Scoring entry point; module-level so a process pool can pickle it by reference."""
+    return recommender.find_similar_content(title, count, content_type, result_type, engine)
+
+def score_similar_content_batch(titles, count, content_type, engine=None, result_type=None):
+    """Batch scoring entry point; module-level so a process pool can pickle it by reference."""
+    return recommender.find_similar_content_batch(
+        titles, count, content_type, BATCH_BLOCK_SIZE, engine, result_type
+    )
+
+# A requested title resolved to the catalog that scores it: the title as stored,
+# the content type and result type to score with, and the title's own content type
+ResolvedTitle = namedtuple(
+    'ResolvedTitle', ('catalog', 'title', 'content_type', 'result_type', 'title_content_type')
+)
+
+def check_result_type(result_type):
+    """Reject a result type that isn't one of the content types."""
+    if result_type is not None and result_type not in data_manager.CONTENT_TYPES:
+        raise ValueError("Invalid result type. Use 'movies' or 'shows'.")
+
+def resolve_title(catalog, title, result_type=None):
+    """
+    Find a requested title in a catalog, falling back to the other content type.
+
+    A title missing from the catalog is looked up in the combined catalog and
+    still gets recommendations of the catalog's content type. A result type
+    other than the catalog's scores the combined catalog.
+
+    Returns:
+        The ResolvedTitle, or None if no catalog has the title
+    """
+    check_result_type(result_type)
+    if not isinstance(title, str):
+        return None
+    content_type = catalog.content_type
+    # Resolve the title ignoring case and punctuation
+    with span('title_normalization'):
+        title_row = catalog.title_index.lookup(title)
+        if title_row is None and content_type != data_manager.ALL_CONTENT:
+            catalog = data_manager.get_combined_catalog()
+            title_row = catalog.title_index.lookup(title)
+            if title_row is not None:
+                result_type = result_type or content_type
+                content_type = data_manager.ALL_CONTENT
+    if title_row is None:
+        return None
+
+    correct_title = catalog.title_index.title(title_row)
+    title_content_type = catalog.row_content_type(title_row)
+    if result_type is not None and result_type != catalog.content_type:
+        # Restricting to another content type scores the combined catalog
+        catalog = data_manager.get_combined_catalog()
+        content_type = data_manager.ALL_CONTENT
+    return ResolvedTitle(catalog, correct_title, content_type, result_type, title_content_type)
+
+def title_not_found(title, content_type):
+    """Error body for a title no catalog has, with the closest titles of any content type."""
+    # Each suggestion resolves through the fallback
+    suggestions = suggest_titles(data_manager.get_combined_catalog(), title)
+    did_you_mean = f' Did you mean "{suggestions[0]}"?' if suggestions else ''
+    return {
+        'error': f'Title "{title}" not found in our {content_type} database.{did_you_mean} Please check the title and try again.',
+        'available_titles': suggestions
+    }
+
+def cache_key(resolved, engine):
+    """Response cache key of a resolved title's recommendations, without the count."""
+    cache_type = f'{resolved.content_type}:{engine}'
+    if resolved.result_type is not None:
+        cache_type += f':{resolved.result_type}'
+    return (resolved.catalog.version, cache_type, normalize_title(resolved.title))
+
+def build_recommendations(catalog, similar_content):
+    """Attach descriptions and content types to (title, similarity) pairs for the response."""
+    title_index = catalog.title_index
+    recommendations = []
+    for rec_title, similarity in similar_content:
+        rec_row = title_index.row(rec_title)
+        if rec_row is not None:  # Only include titles that exist in our dataset
+            recommendations.append({
+                **title_index.payload(rec_row),
+                'content_type': catalog.row_content_type(rec_row),
+                'similarity': similarity
+            })
+    return recommendations
+
+def suggest_titles(catalog, title, count=SUGGESTION_COUNT):
+    """Titles close to one that wasn't found, best match first."""
+    if not isinstance(title, str):
+        return []
+    with span('title_search'):
+        return [catalog.title_index.title(row) for row in catalog.search_index.search(title, count)]
+
+def generate_batch_results(catalog, titles, count, result_type, engine):
+    """Yield one result per requested title, scoring uncached titles a block at a time."""
+    for start in range(0, len(titles), BATCH_BLOCK_SIZE):
+        block = titles[start:start + BATCH_BLOCK_SIZE]
+        results = [None] * len(block)
+        # (content type, result type) scored with -> [(position in block, resolved title)]
+        pending = {}
+
+        for position, title in enumerate(block):
+            resolved = resolve_title(catalog, title, result_type)
+            if resolved is None:
+                results[position] = {'title': title, **title_not_found(title, catalog.content_type)}
+                continue
+            cached = recommendation_cache.get(*cache_key(resolved, engine), count)
+            if cached is None:
+                pending.setdefault((resolved.content_type, resolved.result_type), []).append(
+                    (position, resolved)
+                )
+            else:
+                results[position] = batch_result(title, resolved, cached)
+
+        for (content_type, scored_result_type), group in pending.items():
+            scored = scoring_pool.run(
+                score_similar_content_batch, [resolved.title for _, resolved in group], count,
+                content_type, engine, scored_result_type
+            )
+            for (position, resolved), similar_content in zip(group, scored):
+                if isinstance(similar_content, ValueError):
+                    results[position] = {'title': block[position], 'error': str(similar_content)}
+                    continue
+                recommendation_cache.put(*cache_key(resolved, engine), count, similar_content)
+                results[position] = batch_result(block[position], resolved, similar_content)
+
+        yield from results
+
+def batch_result(title, resolved, similar_content):
+    """Batch entry for a title that was found, shaped like a /recommend response."""
+    return {
+        'title': title,
+        'content_type': resolved.title_content_type,
+        'recommendations': build_recommendations(resolved.catalog, similar_content),
+    }
+
+@app.before_request
+def start_request_timing():
+    g.request_started = time.perf_counter()
+    if request.headers.get(PROFILE_HEADER):
+        g.profile = instrumentation.profile()
+        g.profile_stages = g.profile.__enter__()
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.request_started
+    if instrumentation.enabled:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(elapsed, endpoint)
+        requests_total.inc(endpoint, str(response.status_code))
+    if 'profile' in g:
+        response.headers['Server-Timing'] = instrumentation.server_timing(
+            g.profile_stages + [('total', elapsed)]
+        )
+    return response
+
+@app.teardown_request
+def stop_request_profile(_):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.__exit__(None, None, None)
 
 @app.route('/recommend', methods=['POST'])
 def get_recommendations():
     data = request.get_json()
     title = data.get('title')
     content_type = data.get('content_type', 'movies')  # Default to movies if not specified
+    # Optionally restrict recommendations to one content type, e.g. shows like a movie
+    result_type = data.get('result_type')
     number_of_recommendations = data.get('count', 5)
+    # Similarity engine to score with, e.g. 'jaccard' or 'tfidf'
+    engine = data.get('engine') or recommender.default_engine
+    if not is_valid_count(number_of_recommendations):
+        return jsonify({'error': COUNT_ERROR}), 400
     
     try:
-        # Load the appropriate dataset based on content type
-        data_manager.load_content(content_type)
-        
-        # Get all titles and create a case-insensitive and punctuation-insensitive mapping
-        all_titles = data_manager.data['title'].tolist()
-        
-        def normalize_title(t):
-            # Convert to lowercase and remove punctuation
-            return ''.join(c.lower() for c in t if c.isalnum() or c.isspace()).strip()
-        
-        # Create mapping from normalized titles to original titles
-        title_mapping = {normalize_title(t): t for t in all_titles}
-        
-        # Normalize the search title
-        normalized_search = normalize_title(title)
-        
-        # Check if the normalized version of the title exists
-        if normalized_search not in title_mapping:
-            return jsonify({
-                'error': f'Title "{title}" not found in our {content_type} database. Please check the title and try again.',
-                'available_titles': all_titles[:10]  # Show first 10 titles as suggestions
-            }), 404
-            
-        # Get the correctly formatted title from our mapping
-        correct_title = title_mapping[normalized_search]
-            
+        recommender.get_engine(engine)  # Reject unknown engines before any work
+        # Get the in-memory catalog; it is only re-read if the CSV has changed
+        resolved = resolve_title(data_manager.get_catalog(content_type), title, result_type)
+        if resolved is None:
+            return jsonify(title_not_found(title, content_type)), 404
+
         # Get recommendations with descriptions
-        similar_content = recommender.find_similar_content(correct_title, number_of_recommendations)
-        recommendations = []
-        
-        for rec_title, similarity in similar_content:
-            if rec_title in all_titles:  # Only include titles that exist in our dataset
-                description = data_manager.data[data_manager.data['title'] == rec_title]['description'].iloc[0]
-                recommendations.append({
-                    'title': rec_title,
-                    'description': description,
-                    'similarity': similarity
-                })
+        key = cache_key(resolved, engine)
+        with span('cache_lookup'):
+            similar_content = recommendation_cache.get(*key, number_of_recommendations)
+        if similar_content is None:
+            similar_content = scoring_pool.run(
+                score_similar_content, resolved.title, number_of_recommendations,
+                resolved.content_type, resolved.result_type, engine
+            )
+            recommendation_cache.put(*key, number_of_recommendations, similar_content)
+        with span('response_building'):
+            recommendations = build_recommendations(resolved.catalog, similar_content)
         
         if not recommendations:
             return jsonify({
-                'error': f'No recommendations found for this {content_type} title.',
-                'available_titles': all_titles[:10]
+                'error': f'No recommendations found for this {resolved.content_type} title.',
+                'available_titles': resolved.catalog.title_index.titles[:10]
             }), 404
             
-        return jsonify({'recommendations': recommendations})
+        return jsonify({'recommendations': recommendations, 'content_type': resolved.title_content_type})
         
+    except PoolSaturatedError:
+        return jsonify({'error': 'The server is busy. Please try again shortly.'}), 503
+    except ScoringTimeoutError:
+        return jsonify({'error': 'Generating recommendations took too long. Please try again.'}), 504
+    except Exception as error:
+        return jsonify({'error': str(error)}), 400
+
+@app.route('/recommend/batch', methods=['POST'])
+def get_batch_recommendations():
+    data = request.get_json()
+    titles = data.get('titles')
+    content_type = data.get('content_type', 'movies')
+    result_type = data.get('result_type')
+    number_of_recommendations = data.get('count', 5)
+    engine = data.get('engine') or recommender.default_engine
+
+    if not isinstance(titles, list):
+        return jsonify({'error': 'Provide the titles to look up as a list in "titles".'}), 400
+    if len(titles) > MAX_BATCH_TITLES:
+        return jsonify({'error': f'At most {MAX_BATCH_TITLES} titles can be sent per batch.'}), 400
+    if not is_valid_count(number_of_recommendations):
+        return jsonify({'error': COUNT_ERROR}), 400
+
+    # Large batches (or clients asking for NDJSON) get one JSON line per title as it is scored
+    stream = data.get(
+        'stream',
+        len(titles) > BATCH_STREAM_THRESHOLD
+        or request.accept_mimetypes.best == 'application/x-ndjson'
+    )
+
+    try:
+        recommender.get_engine(engine)
+        check_result_type(result_type)
+        catalog = data_manager.get_catalog(content_type)
+        results = generate_batch_results(
+            catalog, titles, number_of_recommendations, result_type, engine
+        )
+
+        if stream:
+            def generate_lines():
+                try:
+                    for result in results:
+                        yield json.dumps(result) + '\n'
+                except Exception as error:
+                    # Headers are already sent; report the failure as the last line
+                    yield json.dumps({'error': str(error) or type(error).__name__}) + '\n'
+            return Response(stream_with_context(generate_lines()), mimetype='application/x-ndjson')
+
+        return jsonify({'results': list(results)})
+
+    except PoolSaturatedError:
+        return jsonify({'error': 'The server is busy. Please try again shortly.'}), 503
+    except ScoringTimeoutError:
+        return jsonify({'error': 'Generating recommendations took too long. Please try again.'}), 504
     except Exception as error:
         return jsonify({'error': str(error)}), 400
 
+@app.route('/search', methods=['GET'])
+def search_titles():
+    query = request.args.get('q', '').strip()
+    content_type = request.args.get('content_type', data_manager.ALL_CONTENT)
+    if not query:
+        return jsonify({'error': 'Provide a search term in "q".'}), 400
+    try:
+        limit = min(int(request.args.get('limit', SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+        catalog = data_manager.get_catalog(content_type)
+        with span('title_search'):
+            rows = catalog.search_index.search(query, limit)
+        return jsonify({'results': [
+            {'title': catalog.title_index.title(row), 'content_type': catalog.row_content_type(row)}
+            for row in rows
+        ]})
+    except Exception as error:
+        return jsonify({'error': str(error)}), 400
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(recommendation_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(instrumentation.registry.render(),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server; the debugger and reloader are opt-in with FLASK_DEBUG=1
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1')
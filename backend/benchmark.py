@@ -0,0 +1,488 @@
+"""
+Benchmarks of the recommendation hot paths.
+
+    python backend/benchmark.py --output results.json
+    python backend/benchmark.py --sizes 10000 100000 --compare results.json
+
+Each catalog is benchmarked in its own process, so peak memory is measured per
+catalog. The catalogs are the bundled movies and shows CSVs, plus synthetic
+catalogs of the requested sizes. Synthetic catalogs copy the shape of the
+bundled data:
+- description lengths follow the bundled distribution, and words are drawn
+  from the bundled word frequencies;
+- the vocabulary grows with catalog size (Heaps' law), with a Zipf tail of
+  new words;
+- genre lists are drawn from the bundled genre combinations.
+
+For every catalog this reports latency percentiles and throughput of
+find_similar_content and recommend_from_ratings, and of
+HybridRecommender.get_recommendations, with its netflix_recommender imports
+served by these backend modules. find_similar_content is timed with the TF-IDF cosine engine too,
+next to how much of its top 10 it shares with the Jaccard engine's. For the
+bundled catalogs it also reports the /recommend handler,
+with and without a response cache hit. With --cores, both recommenders are also
+timed with parallel scoring on each given number of cores, for a speedup curve. It also
+reports the catalog's memory per 10k titles, in the standard and the compact
+representation (see Catalog.compacted()), including its title, search and
+vocabulary indexes. Results are printed as a scaling table
+and can be saved as JSON to compare runs across commits. Everything runs
+offline on CPU.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MOVIES_PATH = os.path.join(CURRENT_DIR, 'movies.csv')
+SHOWS_PATH = os.path.join(CURRENT_DIR, 'tv_shows.csv')
+
+# Vocabulary growth exponent for synthetic catalogs (Heaps' law, V ~ rows ** beta)
+HEAPS_EXPONENT = 0.5
+
+
+def synthetic_catalog(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a catalog shaped like the bundled data.
+
+    Args:
+        rows: Number of titles to generate
+        seed: Random seed
+
+    Returns:
+        Frame with title, listed_in and description columns
+    """
+    random_state = np.random.default_rng(seed)
+    reference = pd.concat([pd.read_csv(MOVIES_PATH), pd.read_csv(SHOWS_PATH)], ignore_index=True)
+
+    # Description words, most frequent first, extended with a Zipf tail of new
+    # words so the vocabulary grows with the catalog as it does in real data
+    descriptions = reference['description'].fillna('').astype(str).str.split()
+    word_counts = pd.Series([word for words in descriptions for word in words]).value_counts()
+    words = word_counts.index.tolist()
+    weights = word_counts.to_numpy(dtype=np.float64)
+    vocabulary_size = int(len(words) * max(1.0, rows / len(reference)) ** HEAPS_EXPONENT)
+    if vocabulary_size > len(words):
+        ranks = np.arange(len(words) + 1, vocabulary_size + 1)
+        weights = np.concatenate([weights, weights[-1] * len(words) / ranks])
+        words += [f'word{rank:x}' for rank in ranks]
+    words = np.array(words, dtype=object)
+
+    lengths = random_state.choice(descriptions.str.len().to_numpy(), size=rows)
+    drawn = words[random_state.choice(len(words), size=int(lengths.sum()), p=weights / weights.sum())]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    description_column = [' '.join(drawn[offsets[row]:offsets[row + 1]]) for row in range(rows)]
+
+    # Titles reuse bundled title words and end in a unique tag so every row is addressable
+    title_words = np.array(' '.join(reference['title'].astype(str)).split(), dtype=object)
+    title_lengths = random_state.integers(1, 4, size=rows)
+    title_column = [
+        ' '.join(random_state.choice(title_words, size=length)) + f' {row:x}'
+        for row, length in enumerate(title_lengths)
+    ]
+
+    genres = reference['listed_in'].fillna('').to_numpy(dtype=object)
+    return pd.DataFrame({
+        'title': title_column,
+        'listed_in': genres[random_state.integers(0, len(genres), size=rows)],
+        'description': description_column,
+    })
+
+
+def _memory_mb() -> Dict[str, Optional[float]]:
+    """Current and peak resident memory of this process, in MB."""
+    memory = {'rss_mb': None, 'peak_rss_mb': None}
+    try:
+        with open('/proc/self/status', encoding='ascii') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    memory['rss_mb'] = int(line.split()[1]) / 1024
+                elif line.startswith('VmHWM:'):
+                    memory['peak_rss_mb'] = int(line.split()[1]) / 1024
+    except OSError:
+        if resource is not None:
+            # ru_maxrss is reported in kilobytes on Linux
+            memory['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return memory
+
+
+def measure(function: Callable[[Any], Any], inputs: List[Any], warmup: int = 3,
+            before_each: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    """
+    Call function once per input and summarize the latencies.
+
+    Args:
+        function: Function under test, called with one input at a time
+        inputs: Inputs to time, one call each
+        warmup: Untimed calls made first
+        before_each: Untimed setup run before every call
+
+    Returns:
+        Iterations, p50/p99/mean latency in milliseconds and calls per second
+    """
+    for value in inputs[:warmup]:
+        if before_each is not None:
+            before_each()
+        function(value)
+
+    latencies = []
+    for value in inputs:
+        if before_each is not None:
+            before_each()
+        started = time.perf_counter()
+        function(value)
+        latencies.append(time.perf_counter() - started)
+
+    latencies = np.array(latencies) * 1000
+    return {
+        'iterations': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'throughput_per_sec': float(1000 / latencies.mean()),
+    }
+
+
+def _import_hybrid_recommender():
+    """
+    HybridRecommender from the repository root, importing these backend modules.
+
+    It imports the recommenders from the installed netflix_recommender
+    package; the package's modules are aliased to the ones in this directory
+    so the benchmark times the code under test, installed or not.
+    """
+    package = types.ModuleType('netflix_recommender')
+    package.__path__ = []
+    sys.modules['netflix_recommender'] = package
+    for name in ('recommender', 'data_manager', 'topk'):
+        module = __import__(name)
+        setattr(package, name, module)
+        sys.modules[f'netflix_recommender.{name}'] = module
+    sys.path.append(os.path.dirname(CURRENT_DIR))
+    from hybrid_recommender import HybridRecommender
+    return HybridRecommender
+
+
+def run_catalog(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Benchmark one catalog; runs in a fresh process.
+
+    Args:
+        spec: 'name', 'content_type', 'rows' (synthetic size, or None for the
+            bundled CSV), 'queries', 'seed' and 'cores' (thread counts to time
+            parallel scoring with)
+
+    Returns:
+        Catalog size, build time, memory and per-benchmark statistics
+    """
+    from data_manager import DataManager
+    from parallel_scoring import ParallelScorer
+    from recommender import ContentRecommender, UserBasedRecommender
+    from similarity import SimilarityCalculator
+    from similarity_engines import TfidfCosineEngine, available_engines
+
+    content_type = spec['content_type']
+    temporary = None
+    movies_path, shows_path = MOVIES_PATH, SHOWS_PATH
+    if spec['rows'] is not None:
+        # Synthetic catalogs go through the same CSV loading path as real ones
+        temporary = tempfile.TemporaryDirectory()
+        movies_path = shows_path = os.path.join(temporary.name, 'catalog.csv')
+        synthetic_catalog(spec['rows'], spec['seed']).to_csv(movies_path, index=False)
+
+    try:
+        started = time.perf_counter()
+        data_manager = DataManager(movies_path=movies_path, shows_path=shows_path,
+                                   use_cache=spec['rows'] is None)
+        catalog = data_manager.get_catalog(content_type)
+        build_seconds = time.perf_counter() - started
+
+        similarity_calculator = SimilarityCalculator()
+        engines = available_engines()
+        content_recommender = ContentRecommender(data_manager, similarity_calculator,
+                                                 engines=engines)
+        user_recommender = UserBasedRecommender(data_manager, similarity_calculator)
+
+        random_state = random.Random(spec['seed'])
+        titles = catalog.title_index.titles
+        query_titles = [random_state.choice(titles) for _ in range(spec['queries'])]
+        user_ratings = [
+            {title: random_state.randint(1, 5) for title in random_state.sample(titles, 5)}
+            for _ in range(spec['queries'])
+        ]
+
+        benchmarks = {
+            'find_similar_content': measure(
+                lambda title: content_recommender.find_similar_content(title, 10, content_type),
+                query_titles
+            ),
+            'recommend_from_ratings': measure(
+                lambda ratings: user_recommender.recommend_from_ratings(ratings, 10, content_type),
+                user_ratings
+            ),
+        }
+        engine_comparison = None
+        if TfidfCosineEngine.name in engines:
+            started = time.perf_counter()
+            engines[TfidfCosineEngine.name].matrix(catalog)
+            tfidf_build_seconds = time.perf_counter() - started
+            benchmarks['find_similar_content[tfidf]'] = measure(
+                lambda title: content_recommender.find_similar_content(
+                    title, 10, content_type, engine=TfidfCosineEngine.name
+                ),
+                query_titles
+            )
+            # Share of each top 10 that both engines recommend
+            overlaps = []
+            for title in query_titles:
+                jaccard_titles = {
+                    rec_title for rec_title, _ in
+                    content_recommender.find_similar_content(title, 10, content_type)
+                }
+                tfidf_titles = {
+                    rec_title for rec_title, _ in content_recommender.find_similar_content(
+                        title, 10, content_type, engine=TfidfCosineEngine.name
+                    )
+                }
+                overlaps.append(len(jaccard_titles & tfidf_titles) / 10)
+            engine_comparison = {
+                'tfidf_build_seconds': tfidf_build_seconds,
+                'overlap_at_10': float(np.mean(overlaps)),
+            }
+        else:
+            benchmarks['find_similar_content[tfidf]'] = {'skipped': 'scikit-learn not installed'}
+
+        if catalog.neighbor_table is not None:
+            table_recommender = ContentRecommender(data_manager, similarity_calculator,
+                                                   use_neighbor_table=True)
+            benchmarks['find_similar_content[neighbor_table]'] = measure(
+                lambda title: table_recommender.find_similar_content(title, 10, content_type),
+                query_titles
+            )
+
+        for cores in spec['cores']:
+            # Default thresholds, so small catalogs show the serial fallback
+            parallel_scorer = ParallelScorer(max_workers=cores)
+            parallel_content = ContentRecommender(data_manager, similarity_calculator,
+                                                  parallel_scorer=parallel_scorer)
+            parallel_user = UserBasedRecommender(data_manager, similarity_calculator,
+                                                 parallel_scorer=parallel_scorer)
+            benchmarks[f'find_similar_content[{cores} cores]'] = measure(
+                lambda title: parallel_content.find_similar_content(title, 10, content_type),
+                query_titles
+            )
+            benchmarks[f'recommend_from_ratings[{cores} cores]'] = measure(
+                lambda ratings: parallel_user.recommend_from_ratings(ratings, 10, content_type),
+                user_ratings
+            )
+            parallel_scorer.shutdown()
+
+        # The hybrid recommender works on the catalog selected by load_content()
+        data_manager.load_content(content_type)
+        hybrid = _import_hybrid_recommender()(content_recommender, user_recommender)
+        benchmarks['hybrid.get_recommendations'] = measure(
+            lambda query: hybrid.get_recommendations(query[0], query[1], 10),
+            list(zip(query_titles, user_ratings))
+        )
+
+        if spec['rows'] is None:
+            benchmarks.update(_benchmark_handler(content_type, query_titles))
+
+        compact_catalog = catalog.compacted()
+        for measured in (catalog, compact_catalog):
+            measured.search_index  # Count the title search index in both representations
+        catalog_memory = {
+            'standard': catalog.memory_usage(),
+            'compact': compact_catalog.memory_usage(),
+        }
+        return {
+            'name': spec['name'],
+            'content_type': content_type,
+            'synthetic': spec['rows'] is not None,
+            'rows': len(catalog),
+            'vocabulary': len(catalog.feature_index.vocabulary),
+            'build_seconds': build_seconds,
+            **_memory_mb(),
+            'catalog_mb_per_10k': {
+                mode: {part: size / len(catalog) * 10000 / 2 ** 20 for part, size in usage.items()}
+                for mode, usage in catalog_memory.items()
+            },
+            'engine_comparison': engine_comparison,
+            'benchmarks': benchmarks,
+        }
+    finally:
+        if temporary is not None:
+            temporary.cleanup()
+
+
+def _benchmark_handler(content_type: str, query_titles: List[str]) -> Dict[str, Dict[str, float]]:
+    """Time POST /recommend through the Flask test client, on a cache miss and on a hit."""
+    import app as app_module
+
+    client = app_module.app.test_client()
+
+    def post(title: str) -> None:
+        response = client.post('/recommend', json={
+            'title': title, 'content_type': content_type, 'count': 10
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f'/recommend returned {response.status_code}: {response.get_json()}')
+
+    results = {
+        '/recommend[uncached]': measure(
+            post, query_titles, before_each=app_module.recommendation_cache.invalidate
+        ),
+        '/recommend[cached]': measure(post, query_titles[:1] * len(query_titles)),
+    }
+    app_module.scoring_pool.shutdown()
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    """Commit the working tree is at, if it is a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=CURRENT_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """Print p50/p99 per benchmark and catalog, in catalog size order, with an optional baseline."""
+    previous = {}
+    if baseline is not None:
+        previous = {
+            (catalog['name'], name): stats
+            for catalog in baseline['catalogs'] for name, stats in catalog['benchmarks'].items()
+        }
+
+    for catalog in results:
+        print(f"\n{catalog['name']}: {catalog['rows']} titles, {catalog['vocabulary']} tokens, "
+              f"built in {catalog['build_seconds']:.2f}s, peak RSS {catalog['peak_rss_mb'] or 0:.0f} MB")
+        if 'catalog_mb_per_10k' in catalog:
+            print('  catalog memory per 10k titles: ' + ', '.join(
+                f"{mode} {usage['total']:.1f} MB (frame {usage['frame']:.1f}, "
+                f"descriptions {usage['descriptions']:.1f}, features {usage['features']:.1f}, "
+                f"indexes {usage['title_index'] + usage['search_index'] + usage['vocabulary']:.1f})"
+                for mode, usage in catalog['catalog_mb_per_10k'].items()
+            ))
+        if catalog.get('engine_comparison'):
+            comparison = catalog['engine_comparison']
+            print(f"  tfidf vs jaccard: top-10 overlap {comparison['overlap_at_10']:.0%}, "
+                  f"tfidf matrix built in {comparison['tfidf_build_seconds']:.2f}s")
+        for name, stats in catalog['benchmarks'].items():
+            if 'skipped' in stats:
+                print(f'  {name:40s} skipped: {stats["skipped"]}')
+                continue
+            line = (f"  {name:40s} p50 {stats['p50_ms']:9.2f} ms  p99 {stats['p99_ms']:9.2f} ms  "
+                    f"{stats['throughput_per_sec']:9.1f}/s")
+            old = previous.get((catalog['name'], name))
+            if old is not None and 'p50_ms' in old:
+                line += f"  (p50 x{stats['p50_ms'] / old['p50_ms']:.2f} vs baseline)"
+            print(line)
+
+    # Scaling curve: p50 against catalog size for the synthetic catalogs
+    synthetic = [catalog for catalog in results if catalog['synthetic']]
+    if len(synthetic) > 1:
+        names = [name for name, stats in synthetic[0]['benchmarks'].items()
+                 if 'p50_ms' in stats and 'cores]' not in name]
+        print('\nScaling (p50 ms)')
+        print(f"  {'rows':>10s}" + ''.join(f'  {name[:24]:>24s}' for name in names))
+        for catalog in synthetic:
+            print(f"  {catalog['rows']:>10d}" + ''.join(
+                f"  {catalog['benchmarks'][name].get('p50_ms', float('nan')):>24.2f}" for name in names
+            ))
+
+
+def print_core_scaling(results: List[Dict[str, Any]], cores: List[int]) -> None:
+    """Print p50 and speedup over the fewest cores for the parallel scoring benchmarks."""
+    if not cores:
+        return
+    print('\nCore scaling (p50 ms, speedup vs %d core%s)' % (cores[0], '' if cores[0] == 1 else 's'))
+    for catalog in results:
+        for base in ('find_similar_content', 'recommend_from_ratings'):
+            timings = [catalog['benchmarks'][f'{base}[{count} cores]']['p50_ms'] for count in cores]
+            curve = '  '.join(f'{count}: {p50:.2f} (x{timings[0] / p50:.2f})'
+                              for count, p50 in zip(cores, timings))
+            print(f"  {catalog['name']:18s} {base:24s} {curve}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the recommendation hot paths.')
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10000, 100000, 1000000],
+                        help='Synthetic catalog sizes (default: 10k, 100k and 1M titles)')
+    parser.add_argument('--queries', type=int, default=200,
+                        help='Timed calls per benchmark and catalog')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for catalogs and queries')
+    parser.add_argument('--cores', type=int, nargs='*', default=[],
+                        help='Also time parallel scoring with each number of cores, e.g. 1 2 4')
+    parser.add_argument('--skip-bundled', action='store_true',
+                        help='Only benchmark synthetic catalogs')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    args = parser.parse_args()
+
+    specs = []
+    if not args.skip_bundled:
+        specs += [
+            {'name': f'bundled-{content_type}', 'content_type': content_type, 'rows': None}
+            for content_type in ('movies', 'shows')
+        ]
+    specs += [
+        {'name': f'synthetic-{rows}', 'content_type': 'movies', 'rows': rows}
+        for rows in sorted(args.sizes)
+    ]
+
+    results = []
+    for spec in specs:
+        spec.update(queries=args.queries, seed=args.seed, cores=sorted(args.cores))
+        print(f"Benchmarking {spec['name']}...", flush=True)
+        # A fresh process per catalog keeps peak memory readings separate
+        with ProcessPoolExecutor(max_workers=1,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            results.append(executor.submit(run_catalog, spec).result())
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as source:
+            baseline = json.load(source)
+    print_report(results, baseline)
+    print_core_scaling(results, sorted(args.cores))
+
+    if args.output:
+        report = {
+            'commit': _git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'queries': args.queries,
+            'cores': sorted(args.cores),
+            'seed': args.seed,
+            'catalogs': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+        print(f'\nWrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
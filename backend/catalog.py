@@ -0,0 +1,219 @@
+from dataclasses import dataclass, replace
+from functools import cached_property
+from typing import Any, Dict, Optional, Sequence, TYPE_CHECKING
+import hashlib
+import numpy as np
+import pandas as pd
+from feature_index import FeatureIndex
+from text_column import TextColumn
+from title_index import TitleIndex, objects_nbytes
+from title_search import TitleSearchIndex
+
+if TYPE_CHECKING:
+    from neighbors import NeighborTable
+
+# Columns a compact catalog keeps; nothing on the serving path reads the others
+SERVING_COLUMNS = ('title', 'type', 'rating', 'listed_in', 'description', 'content_type')
+# Low-cardinality columns a compact catalog stores as categorical codes
+CATEGORICAL_COLUMNS = ('type', 'rating', 'listed_in', 'content_type')
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """
+    Immutable snapshot of one content type's data and its derived indexes.
+
+    A catalog is built once and never mutated; reloading or editing produces
+    a new Catalog that replaces the old one, so a request that already holds
+    a reference keeps a consistent view of frame and indexes. revision counts
+    the edits applied in memory on top of the source file.
+
+    A compact catalog (see compacted()) keeps only the serving columns, with
+    low-cardinality ones as categorical codes, and moves descriptions out of
+    the frame into a TextColumn held by its title index.
+    """
+    content_type: str
+    frame: pd.DataFrame
+    title_index: TitleIndex
+    feature_index: FeatureIndex
+    source_path: str
+    source_mtime: float
+    source_hash: str
+    neighbor_table: Optional['NeighborTable'] = None
+    revision: int = 0
+    # Content type of every row, for a catalog combining several content types
+    content_types: Optional[np.ndarray] = None
+    compact: bool = False
+
+    @classmethod
+    def from_frame(cls, content_type: str, frame: pd.DataFrame, source_path: str,
+                   source_mtime: float, source_hash: str,
+                   feature_index: Optional[FeatureIndex] = None) -> 'Catalog':
+        """
+        Build the title and feature indexes for a frame and wrap them in a catalog.
+
+        A prebuilt feature index (e.g. one loaded from the on-disk cache) is
+        used as-is instead of re-tokenizing the frame.
+        """
+        if 'description' in frame.columns:
+            descriptions = frame['description'].tolist()
+        else:
+            descriptions = [''] * len(frame)
+
+        return cls(
+            content_type=content_type,
+            frame=frame,
+            title_index=TitleIndex(frame['title'].tolist(), descriptions),
+            feature_index=feature_index or FeatureIndex.from_frame(frame),
+            source_path=source_path,
+            source_mtime=source_mtime,
+            source_hash=source_hash,
+        )
+
+    @classmethod
+    def combine(cls, content_type: str, catalogs: Sequence['Catalog']) -> 'Catalog':
+        """
+        Stack several catalogs into one, with a content type column.
+
+        Rows keep their order, catalog after catalog, and the feature
+        matrices are merged over one vocabulary so a single scan scores every
+        content type. Only SERVING_COLUMNS are copied into the combined
+        frame. The combined version changes whenever a member's does.
+        """
+        frames = []
+        for catalog in catalogs:
+            frame = catalog.full_frame()
+            frame = frame[[column for column in frame.columns if column in SERVING_COLUMNS]]
+            frames.append(frame.assign(content_type=catalog.content_type))
+        frame = pd.concat(frames, ignore_index=True)
+        combined = cls.from_frame(
+            content_type, frame, source_path='', source_mtime=0.0,
+            source_hash=hashlib.sha256(
+                '+'.join(catalog.version for catalog in catalogs).encode('utf-8')
+            ).hexdigest(),
+            feature_index=FeatureIndex.concat([catalog.feature_index for catalog in catalogs]),
+        )
+        combined = replace(combined, content_types=frame['content_type'].to_numpy(dtype=object))
+        if all(catalog.compact for catalog in catalogs):
+            combined = combined.compacted()
+        return combined
+
+    def compacted(self) -> 'Catalog':
+        """
+        Copy of this catalog in the compact representation.
+
+        Drops every column outside SERVING_COLUMNS, stores CATEGORICAL_COLUMNS
+        as pandas categoricals (integer codes plus one copy of each distinct
+        value) and packs descriptions into one UTF-8 buffer with offsets.
+        Indexes are shared with this catalog.
+        """
+        if self.compact:
+            return self
+        columns = [column for column in self.frame.columns
+                   if column in SERVING_COLUMNS and column != 'description']
+        frame = self.frame[columns].astype(
+            {column: 'category' for column in CATEGORICAL_COLUMNS if column in columns}
+        )
+        if 'description' in self.frame.columns:
+            descriptions = TextColumn.from_strings(self.frame['description'])
+        else:
+            descriptions = TextColumn.from_strings([''] * len(self.frame))
+        return replace(
+            self, frame=frame, title_index=TitleIndex(self.title_index.titles, descriptions),
+            compact=True
+        )
+
+    def full_frame(self) -> pd.DataFrame:
+        """
+        The catalog as a plain frame, with descriptions and object-dtype columns.
+
+        For a compact catalog this is rebuilt on each call, so it is meant for
+        edits and offline use rather than the request path.
+        """
+        if not self.compact:
+            return self.frame
+        frame = self.frame.astype(
+            {column: object for column in CATEGORICAL_COLUMNS if column in self.frame.columns}
+        )
+        return frame.assign(description=self.title_index.descriptions.tolist())
+
+    def record(self, row: int) -> Dict[str, Any]:
+        """Column values of one row, including its description."""
+        record = self.frame.iloc[row].to_dict()
+        if self.compact:
+            record['description'] = self.title_index.description(row)
+        return record
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Bytes held by the catalog's data and indexes, by part.
+
+        Python objects are measured with sys.getsizeof. Strings the title
+        index shares with the frame are counted once, with the frame. The
+        text memo of SimilarityCalculator.preprocess_text is process-wide
+        and holds ad-hoc text only, so it is not included.
+
+        Returns:
+            'frame' (including the strings it references), 'descriptions'
+            (the packed buffer of a compact catalog, or the description list
+            of a standard one), 'title_index' (title list and lookup
+            dictionaries), 'search_index' (0 until it is first built),
+            'features' (feature matrix arrays), 'vocabulary' (the shared token
+            dictionary), 'neighbors' (the neighbor table, if loaded) and
+            their 'total'
+        """
+        # The frame's title and description strings, already counted by pandas;
+        # the arrays keep the objects, and so their ids, alive
+        frame_columns = [self.frame[column].to_numpy(dtype=object)
+                         for column in ('title', 'description') if column in self.frame.columns]
+        seen = {id(value) for values in frame_columns for value in values}
+        descriptions = self.title_index.descriptions
+        vocabulary = self.feature_index.vocabulary
+        usage = {
+            'frame': int(self.frame.memory_usage(deep=True).sum()),
+            'descriptions': (
+                descriptions.nbytes if isinstance(descriptions, TextColumn)
+                else objects_nbytes([descriptions], seen) + objects_nbytes(descriptions, seen)
+            ),
+            'title_index': self.title_index.nbytes(seen),
+            'search_index': (
+                self.__dict__['search_index'].nbytes(seen) if 'search_index' in self.__dict__ else 0
+            ),
+            'features': sum(
+                part.nbytes for matrix in self.feature_index.matrices.values()
+                for part in (matrix.data, matrix.indices, matrix.indptr)
+            ),
+            'vocabulary': (objects_nbytes([vocabulary], seen) + objects_nbytes(vocabulary, seen)
+                           + objects_nbytes(vocabulary.values(), seen)),
+            'neighbors': (
+                self.neighbor_table.ids.nbytes + self.neighbor_table.scores.nbytes
+                if self.neighbor_table is not None else 0
+            ),
+        }
+        usage['total'] = sum(usage.values())
+        return usage
+
+    @cached_property
+    def search_index(self) -> TitleSearchIndex:
+        """Autocomplete and fuzzy search index over the titles, built on first use."""
+        return TitleSearchIndex(self.title_index.titles)
+
+    def type_mask(self, content_type: str) -> np.ndarray:
+        """Boolean mask over all rows, set for rows of the given content type."""
+        if self.content_types is None:
+            return np.full(len(self), content_type == self.content_type)
+        return self.content_types == content_type
+
+    def row_content_type(self, row: int) -> str:
+        """Content type of one row."""
+        return self.content_type if self.content_types is None else self.content_types[row]
+
+    @property
+    def version(self) -> str:
+        """Short identifier of the source data and edits this catalog was built from."""
+        if self.revision:
+            return f'{self.source_hash[:12]}-r{self.revision}'
+        return self.source_hash[:12]
+
+    def __len__(self) -> int:
+        return len(self.frame)
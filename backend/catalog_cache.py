@@ -0,0 +1,179 @@
+"""
+Versioned binary cache of built catalogs.
+
+A cache lives next to the source CSV (movies.csv -> movies.cache/) and holds one
+subdirectory per cache format version and source hash:
+
+    movies.cache/v2-<sha256>/
+        meta.json                 format version, source hash, shapes
+        frame.parquet|frame.pkl   the catalog frame
+        vocabulary.json           token list shared by all fields, in column order
+        <field>.indptr.npy        CSR arrays per feature field, loadable with
+        <field>.indices.npy       np.load(mmap_mode='r') so worker processes on
+        <field>.data.npy          one machine share the same page cache
+
+Because the directory name includes the source hash, editing the CSV makes old
+caches unreachable; they (and other artifacts keyed by an old hash, such as
+neighbor tables) are pruned the next time a cache is written.
+"""
+from typing import Dict, Optional
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from catalog import Catalog
+from feature_index import FeatureIndex
+
+CACHE_VERSION = 2
+
+
+def cache_root(source_path: str) -> str:
+    """Directory that holds all cached builds of a source CSV."""
+    return os.path.splitext(source_path)[0] + '.cache'
+
+
+def cache_dir(source_path: str, source_hash: str) -> str:
+    """Directory of the cache for one version of a source CSV."""
+    return os.path.join(cache_root(source_path), f'v{CACHE_VERSION}-{source_hash}')
+
+
+def write_cache(catalog: Catalog) -> str:
+    """
+    Write a catalog to its on-disk cache.
+
+    The cache is written to a temporary directory and renamed into place, so a
+    reader never sees a partially written cache.
+
+    Only catalogs holding the whole source file can be cached; a reader
+    could otherwise load a compact or edited frame as the source.
+
+    Returns:
+        Path of the cache directory
+    """
+    if catalog.compact or catalog.revision:
+        raise ValueError('Only catalogs built from every column of the source file can be cached.')
+    root = cache_root(catalog.source_path)
+    target = cache_dir(catalog.source_path, catalog.source_hash)
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=root)
+
+    try:
+        frame = catalog.full_frame()
+        try:
+            frame.to_parquet(os.path.join(staging, 'frame.parquet'), index=False)
+            frame_format = 'parquet'
+        except ImportError:
+            # No parquet engine installed; pickle keeps dtypes just as well
+            frame.to_pickle(os.path.join(staging, 'frame.pkl'))
+            frame_format = 'pickle'
+
+        feature_index = catalog.feature_index
+        for field, matrix in feature_index.matrices.items():
+            for part in ('indptr', 'indices', 'data'):
+                np.save(os.path.join(staging, f'{field}.{part}.npy'), getattr(matrix, part))
+
+        vocabulary = feature_index.vocabulary
+        with open(os.path.join(staging, 'vocabulary.json'), 'w', encoding='utf-8') as output:
+            json.dump(sorted(vocabulary, key=vocabulary.get), output, ensure_ascii=False)
+
+        # meta.json is written last; its presence marks a complete cache
+        meta = {
+            'cache_version': CACHE_VERSION,
+            'content_type': catalog.content_type,
+            'source_hash': catalog.source_hash,
+            'rows': len(catalog),
+            'frame_format': frame_format,
+            'weights': feature_index.weights,
+            'shapes': {field: list(matrix.shape) for field, matrix in feature_index.matrices.items()},
+        }
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as output:
+            json.dump(meta, output, indent=2)
+
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Drop caches built from older versions of the source file or in an older format
+    for entry in os.listdir(root):
+        path = os.path.join(root, entry)
+        stale = (not entry.endswith(catalog.source_hash)
+                 or (entry.startswith('v') and path != target))
+        if stale and not entry.startswith('.staging-') and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+    return target
+
+
+def load_cache(content_type: str, source_path: str, source_mtime: float,
+               source_hash: str) -> Optional[Catalog]:
+    """
+    Load a catalog from its on-disk cache.
+
+    Feature arrays are memory-mapped read-only rather than read into memory.
+
+    Returns:
+        The cached catalog, or None if there is no complete cache for this
+        source hash and cache format version
+    """
+    directory = cache_dir(source_path, source_hash)
+    meta_path = os.path.join(directory, 'meta.json')
+    if not os.path.isfile(meta_path):
+        return None
+
+    with open(meta_path, encoding='utf-8') as source:
+        meta = json.load(source)
+    if meta.get('cache_version') != CACHE_VERSION or meta.get('source_hash') != source_hash:
+        return None
+
+    if meta['frame_format'] == 'parquet':
+        frame = pd.read_parquet(os.path.join(directory, 'frame.parquet'))
+    else:
+        frame = pd.read_pickle(os.path.join(directory, 'frame.pkl'))
+
+    with open(os.path.join(directory, 'vocabulary.json'), encoding='utf-8') as source:
+        tokens = json.load(source)
+
+    matrices: Dict[str, sparse.csr_matrix] = {}
+    for field, shape in meta['shapes'].items():
+        arrays = [
+            np.load(os.path.join(directory, f'{field}.{part}.npy'), mmap_mode='r')
+            for part in ('data', 'indices', 'indptr')
+        ]
+        matrices[field] = sparse.csr_matrix(tuple(arrays), shape=tuple(shape), copy=False)
+
+    feature_index = FeatureIndex(
+        matrices,
+        {token: column for column, token in enumerate(tokens)},
+        meta['weights'],
+    )
+    return Catalog.from_frame(
+        content_type, frame, source_path, source_mtime, source_hash,
+        feature_index=feature_index
+    )
+
+
+def main():
+    from data_manager import DataManager
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Build the binary catalog cache.')
+    parser.add_argument('--movies', default=os.path.join(current_dir, 'movies.csv'),
+                        help='Path to the movies CSV')
+    parser.add_argument('--shows', default=os.path.join(current_dir, 'tv_shows.csv'),
+                        help='Path to the TV shows CSV')
+    args = parser.parse_args()
+
+    data_manager = DataManager(movies_path=args.movies, shows_path=args.shows, use_cache=False)
+    for content_type, path in data_manager.build_cache().items():
+        print(f'Wrote {content_type} cache to {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,419 @@
-from typing import Dict, Any
+from dataclasses import replace
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+import hashlib
+import os
+import threading
+import numpy as np
 import pandas as pd
+from catalog import Catalog, SERVING_COLUMNS
+import catalog_cache
+import neighbors
+from instrumentation import span
 
 class DataManager:
-    def __init__(self, movies_path: str, shows_path: str):
-        """Initialize DataManager with paths to data files."""
+    CONTENT_TYPES = ('movies', 'shows')
+    # Pseudo content type of the catalog combining every content type
+    ALL_CONTENT = 'all'
+
+    def __init__(self, movies_path: str, shows_path: str, use_cache: bool = True,
+                 compact: bool = False):
+        """
+        Initialize DataManager with paths to data files.
+
+        With use_cache enabled, catalogs are loaded from the binary cache
+        written by build_cache() when one exists for the current source file,
+        along with any neighbor table built by neighbors.py. With compact
+        enabled, catalogs are kept in the compact representation (see
+        Catalog.compacted()), which holds only the columns used for serving.
+        """
         self.movies_path = movies_path
         self.shows_path = shows_path
+        self.use_cache = use_cache
+        self.compact = compact
         self.data = None
+        self.feature_index = None
+        self.catalog = None
+        self._catalogs: Dict[str, Catalog] = {}
+        self._reload_lock = threading.Lock()
+        # Member catalog versions the combined catalog was built from, and the catalog
+        self._combined: Optional[Tuple[Tuple[str, ...], Catalog]] = None
+        self._combined_lock = threading.Lock()
+        self._reload_listeners: List[Callable[[Catalog], None]] = []
+
+    def add_reload_listener(self, listener: Callable[[Catalog], None]) -> None:
+        """Call listener with the new catalog whenever a loaded catalog is replaced by changed data."""
+        self._reload_listeners.append(listener)
 
     def load_content(self, content_type: str = 'movies') -> None:
         """Load content data based on type."""
+        with span('load_content'):
+            self.catalog = self.get_catalog(content_type)
+        self.data = self.catalog.frame
+        self.feature_index = self.catalog.feature_index
+
+    def load_all(self) -> None:
+        """Load every content type so requests never wait on CSV parsing."""
+        for content_type in self.CONTENT_TYPES:
+            self.get_catalog(content_type)
+
+    def get_catalog(self, content_type: Optional[str] = None) -> Catalog:
+        """
+        Get the current catalog for a content type.
+
+        Catalogs are loaded once and kept in memory. The source file is only
+        re-read when its modification time changes and its contents hash to a
+        different value; the new catalog then replaces the old one in a single
+        assignment, so concurrent readers see either the old or the new snapshot.
+        While one thread reloads a changed file, other readers keep getting the
+        current snapshot instead of waiting; only the first load of a content
+        type blocks.
+
+        Args:
+            content_type: 'movies', 'shows' or 'all' for the combined catalog
+                (see get_combined_catalog); None returns the catalog selected
+                by the last load_content() call
+
+        Returns:
+            The catalog snapshot for the content type
+        """
+        if content_type is None:
+            if self.catalog is None:
+                raise ValueError("No data loaded. Call load_content() first.")
+            if self.catalog.content_type == self.ALL_CONTENT:
+                return self.get_combined_catalog()
+            return self.catalog
+        if content_type == self.ALL_CONTENT:
+            return self.get_combined_catalog()
+
+        source_path = self._source_path(content_type)
+        catalog = self._catalogs.get(content_type)
+        if catalog is not None and catalog.source_mtime == os.path.getmtime(source_path):
+            return catalog
+
+        if catalog is not None:
+            # Serve the published snapshot while another thread reloads it
+            if not self._reload_lock.acquire(blocking=False):
+                return catalog
+        else:
+            self._reload_lock.acquire()
+        try:
+            # Another thread may have reloaded while we waited for the lock
+            catalog = self._catalogs.get(content_type)
+            source_mtime = os.path.getmtime(source_path)
+            if catalog is not None and catalog.source_mtime == source_mtime:
+                return catalog
+
+            source_hash = self._hash_file(source_path)
+            if catalog is not None and catalog.source_hash == source_hash:
+                # File was touched but not changed; keep the indexes we have
+                catalog = replace(catalog, source_mtime=source_mtime)
+            else:
+                catalog = None
+                if self.use_cache:
+                    with span('catalog_cache_load'):
+                        catalog = catalog_cache.load_cache(
+                            content_type, source_path, source_mtime, source_hash
+                        )
+                if catalog is None:
+                    with span('csv_load'):
+                        frame = self._read_frame(source_path, serving_only=self.compact)
+                    with span('catalog_build'):
+                        catalog = Catalog.from_frame(
+                            content_type, frame, source_path, source_mtime, source_hash
+                        )
+                if self.compact:
+                    catalog = catalog.compacted()
+                if self.use_cache:
+                    catalog = replace(catalog, neighbor_table=neighbors.load_table(
+                        source_path, source_hash
+                    ))
+            previous = self._catalogs.get(content_type)
+            self._publish(catalog)
+        finally:
+            self._reload_lock.release()
+
+        if previous is not None and previous.source_hash != catalog.source_hash:
+            for listener in self._reload_listeners:
+                listener(catalog)
+        return catalog
+
+    def get_combined_catalog(self) -> Catalog:
+        """
+        Get the catalog of every content type stacked into one index.
+
+        Its rows are the movies followed by the shows, and its content_types
+        column tells them apart, so one scan can score both and a type mask
+        restricts the results. It is rebuilt from the current catalogs the
+        first time it is requested after either of them changes; building
+        merges their prebuilt feature matrices without re-tokenizing.
+
+        Returns:
+            The combined catalog snapshot, with content type 'all'
+        """
+        members = [self.get_catalog(content_type) for content_type in self.CONTENT_TYPES]
+        versions = tuple(member.version for member in members)
+        combined = self._combined
+        if combined is not None and combined[0] == versions:
+            return combined[1]
+
+        with self._combined_lock:
+            combined = self._combined
+            if combined is None or combined[0] != versions:
+                with span('catalog_build'):
+                    combined = (versions, Catalog.combine(self.ALL_CONTENT, members))
+                self._combined = combined
+        return combined[1]
+
+    def locate_title(self, title: str) -> Optional[Tuple[str, str]]:
+        """
+        Find a title in any catalog, ignoring case and punctuation.
+
+        Returns:
+            (content type, title as stored in that catalog), or None if no
+            catalog has it
+        """
+        catalog = self.get_combined_catalog()
+        row = catalog.title_index.lookup(title)
+        if row is None:
+            return None
+        return catalog.row_content_type(row), catalog.title_index.title(row)
+
+    def add_titles(self, content_type: str, records: List[Dict[str, Any]]) -> Catalog:
+        """
+        Append titles to a catalog without rebuilding it.
+
+        Args:
+            content_type: 'movies' or 'shows'
+            records: One dictionary of column values per new title; each
+                needs a 'title', and served columns it leaves out are ''
+
+        Returns:
+            The new catalog snapshot
+        """
+        if any(not record.get('title') for record in records):
+            raise ValueError("Every added title needs a 'title' value.")
+        return self._edit_catalog(content_type, added=records)
+
+    def update_titles(self, content_type: str, updates: Dict[str, Dict[str, Any]]) -> Catalog:
+        """
+        Change column values of existing titles without rebuilding the catalog.
+
+        Args:
+            content_type: 'movies' or 'shows'
+            updates: Dictionary mapping an exact title to the column values to
+                set; every row with that title is updated, and served columns
+                set to None are ''
+
+        Returns:
+            The new catalog snapshot
+        """
+        return self._edit_catalog(content_type, updates=updates)
+
+    def remove_titles(self, content_type: str, titles: Iterable[str]) -> Catalog:
+        """
+        Remove titles from a catalog without rebuilding it.
+
+        Args:
+            content_type: 'movies' or 'shows'
+            titles: Exact titles to remove; every row with one of them is removed
+
+        Returns:
+            The new catalog snapshot
+        """
+        return self._edit_catalog(content_type, removed=titles)
+
+    def _edit_catalog(self, content_type: str, removed: Iterable[str] = (),
+                      updates: Optional[Dict[str, Dict[str, Any]]] = None,
+                      added: Optional[List[Dict[str, Any]]] = None) -> Catalog:
+        """
+        Apply edits to a copy of a catalog and publish it as a new revision.
+
+        Only the edited rows are re-tokenized, and only neighbor lists the edit
+        can change are rescored. The current catalog is never modified, so
+        requests already holding it finish on the old snapshot while new ones
+        see the edited one.
+
+        Edits live in memory on top of the source file; if the file itself
+        changes, the catalog is reloaded from it and the edits are dropped.
+        """
+        if content_type not in self.CONTENT_TYPES:
+            raise ValueError("Titles can only be edited in the 'movies' or 'shows' catalog.")
+        self.get_catalog(content_type)
+        with self._reload_lock:
+            catalog = self._catalogs[content_type]
+            removed_rows = self._resolve_rows(catalog, removed)
+            updated_rows = {
+                row: fields
+                for title, fields in (updates or {}).items()
+                for row in self._resolve_rows(catalog, [title])
+            }
+
+            kept_rows = np.setdiff1d(np.arange(len(catalog)), removed_rows)
+            frame = catalog.full_frame().iloc[kept_rows].reset_index(drop=True)
+            updated_positions = np.searchsorted(kept_rows, list(updated_rows)).astype(np.intp)
+            for position, fields in zip(updated_positions, updated_rows.values()):
+                for column, value in fields.items():
+                    frame.loc[position, column] = value
+            if added:
+                frame = pd.concat([frame, pd.DataFrame(added)], ignore_index=True)
+            changed_rows = np.concatenate([
+                np.sort(updated_positions), np.arange(len(kept_rows), len(frame))
+            ])
+            # Missing serving values would reach responses as NaN, which isn't valid JSON
+            for column in SERVING_COLUMNS:
+                if column in frame.columns:
+                    frame.loc[changed_rows, column] = frame.loc[changed_rows, column].fillna('')
+
+            feature_index = catalog.feature_index.with_rows(kept_rows, frame, changed_rows)
+            neighbor_table = None
+            if catalog.neighbor_table is not None:
+                neighbor_table = neighbors.update_table(
+                    catalog.neighbor_table, feature_index, frame['title'].tolist(),
+                    kept_rows, changed_rows
+                )
+            edited = Catalog.from_frame(content_type, frame, catalog.source_path,
+                                        catalog.source_mtime, catalog.source_hash,
+                                        feature_index=feature_index)
+            if catalog.compact:
+                edited = edited.compacted()
+            edited = replace(
+                edited,
+                neighbor_table=neighbor_table,
+                revision=catalog.revision + 1,
+            )
+            self._publish(edited)
+
+        for listener in self._reload_listeners:
+            listener(edited)
+        return edited
+
+    @staticmethod
+    def _resolve_rows(catalog: Catalog, titles: Iterable[str]) -> List[int]:
+        """Every row with one of the given exact titles."""
+        rows = []
+        for title in titles:
+            title_rows = catalog.title_index.rows(title)
+            if not title_rows:
+                raise ValueError(f"Title '{title}' not found in dataset.")
+            rows.extend(title_rows)
+        return rows
+
+    def _publish(self, catalog: Catalog) -> None:
+        """Make a catalog the current one for its content type, in single assignments."""
+        self._catalogs[catalog.content_type] = catalog
+        if self.catalog is not None and self.catalog.content_type == catalog.content_type:
+            self.catalog = catalog
+            self.data = catalog.frame
+            self.feature_index = catalog.feature_index
+
+    def build_cache(self) -> Dict[str, str]:
+        """
+        Write the binary cache for every content type.
+
+        The cache always holds the source file with every column, whatever
+        this DataManager serves: compact catalogs and catalogs with in-memory
+        edits are rebuilt from the source file before writing.
+
+        Returns:
+            Dictionary mapping content type to the cache directory written
+        """
+        directories = {}
+        for content_type in self.CONTENT_TYPES:
+            catalog = self.get_catalog(content_type)
+            if catalog.compact or catalog.revision:
+                frame = self._read_frame(catalog.source_path)
+                source_hash = self._hash_file(catalog.source_path)
+                # The feature index still matches the source unless the file
+                # or the catalog changed since it was built
+                unchanged = source_hash == catalog.source_hash and not catalog.revision
+                catalog = Catalog.from_frame(
+                    content_type, frame, catalog.source_path,
+                    os.path.getmtime(catalog.source_path), source_hash,
+                    feature_index=catalog.feature_index if unchanged else None
+                )
+            directories[content_type] = catalog_cache.write_cache(catalog)
+        return directories
+
+    def _source_path(self, content_type: str) -> str:
+        """Resolve the CSV path for a content type."""
         if content_type == 'movies':
-            self.data = pd.read_csv(self.movies_path)
+            return self.movies_path
         elif content_type == 'shows':
-            self.data = pd.read_csv(self.shows_path)
+            return self.shows_path
+        raise ValueError("Invalid content type. Use 'movies', 'shows' or 'all'.")
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        """SHA-256 of a file's contents."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _read_frame(path: str, serving_only: bool = False) -> pd.DataFrame:
+        """
+        Read a catalog CSV and normalize its title column.
+
+        With serving_only, columns outside SERVING_COLUMNS are never parsed.
+        """
+        if serving_only:
+            data = pd.read_csv(path, usecols=lambda column: (
+                column in SERVING_COLUMNS or column in ('name', 'show_title')
+            ))
         else:
-            raise ValueError("Invalid content type. Use 'movies' or 'shows'.")
-        
+            data = pd.read_csv(path)
+
         # Ensure we have a consistent title column
-        if 'title' not in self.data.columns:
-            if 'name' in self.data.columns:
-                self.data = self.data.rename(columns={'name': 'title'})
-            elif 'show_title' in self.data.columns:
-                self.data = self.data.rename(columns={'show_title': 'title'})
+        if 'title' not in data.columns:
+            if 'name' in data.columns:
+                data = data.rename(columns={'name': 'title'})
+            elif 'show_title' in data.columns:
+                data = data.rename(columns={'show_title': 'title'})
             else:
                 raise ValueError("No title column found in the dataset")
+        return data
+
+    def find_title(self, title: str, content_type: Optional[str] = None) -> Optional[str]:
+        """
+        Resolve a title as the user typed it to the catalog's spelling.
+
+        Matching ignores case and punctuation.
+
+        Returns:
+            The title as stored in the catalog, or None if it isn't there
+        """
+        title_index = self.get_catalog(content_type).title_index
+        row = title_index.lookup(title)
+        return None if row is None else title_index.title(row)
+
+    def search_titles(self, term: str, content_type: Optional[str] = None,
+                      limit: int = 10) -> List[str]:
+        """
+        Find titles matching a partial or misspelled search term.
+
+        Titles with a word starting with the term come first, then titles
+        ranked by how many character trigrams they share with it.
+
+        Args:
+            term: Search term as the user typed it
+            content_type: Catalog to search; defaults to the loaded catalog
+            limit: Maximum number of titles to return
+
+        Returns:
+            Matching titles as stored in the catalog, best match first
+        """
+        catalog = self.get_catalog(content_type)
+        return [catalog.title_index.title(row) for row in catalog.search_index.search(term, limit)]
 
     def get_content_features(self, title: str) -> Dict[str, Any]:
         """Get features for a specific title."""
         if self.data is None:
             raise ValueError("No data loaded. Call load_content() first.")
         
-        content = self.data[self.data['title'] == title]
-        if content.empty:
+        row = self.catalog.title_index.row(title)
+        if row is None:
             raise ValueError(f"Title '{title}' not found in dataset.")
         
-        return content.iloc[0].to_dict()
\ No newline at end of file
+        return self.catalog.record(row)
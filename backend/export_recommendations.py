@@ -0,0 +1,266 @@
+"""
+Streaming export of the top-K recommendations of every title.
+
+    python backend/export_recommendations.py --output recommendations.jsonl --k 20
+
+Titles are scored in chunks (one sparse matrix product per chunk) on a process
+pool and written in catalog order as they complete, with only a bounded number
+of chunks in flight, so memory stays flat however large the catalog is. Each
+output record is
+
+    {"content_type": "movies", "title": "...",
+     "recommendations": [{"title": "...", "similarity": 0.42}, ...]}
+
+Output is JSONL, or Parquet (one part file per chunk in a directory) when the
+output path ends in .parquet; Parquet needs pyarrow installed.
+
+Progress is checkpointed after every chunk. Rerunning the same command (with
+the same --chunk-size) after an interruption resumes where it stopped; pass
+--restart to start over.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from neighbors import init_worker, worker_neighbors
+
+
+def bounded_ordered_map(executor, function: Callable, items: Iterable, window: int) -> Iterator[Tuple[Any, Any]]:
+    """
+    Like executor.map, but with at most window jobs submitted at a time.
+
+    executor.map submits every item up front and holds all finished results
+    until they are consumed; this keeps memory bounded by the window instead.
+
+    Yields:
+        (item, result) pairs in input order
+    """
+    in_flight = collections.deque()
+    for item in items:
+        in_flight.append((item, executor.submit(function, item)))
+        if len(in_flight) >= window:
+            item, future = in_flight.popleft()
+            yield item, future.result()
+    while in_flight:
+        item, future = in_flight.popleft()
+        yield item, future.result()
+
+
+class JSONLSink:
+    """Appends records to a JSON Lines file; resumes by truncating to the checkpointed size."""
+
+    def __init__(self, path: str, checkpoint: Optional[Dict[str, Any]]):
+        self.path = path
+        self._file = open(path, 'r+b' if checkpoint is not None else 'wb')
+        if checkpoint is not None:
+            # Drop anything written after the last checkpoint
+            self._file.truncate(checkpoint['position'])
+            self._file.seek(checkpoint['position'])
+
+    def write(self, content_type: str, records: List[Dict[str, Any]], start: int) -> None:
+        lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        self._file.write(lines.encode('utf-8'))
+
+    def position(self) -> int:
+        """Flush and return the file size, to be stored in the checkpoint."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def remove_stale_parts(path: str, next_rows: Optional[Dict[str, int]]) -> None:
+    """
+    Delete Parquet part files the checkpoint doesn't cover.
+
+    Args:
+        path: Output directory of part files
+        next_rows: Checkpointed next row per content type; parts starting at
+            or past it were written after the checkpoint. None deletes every
+            part, for an export starting from the beginning
+    """
+    for name in os.listdir(path):
+        if not name.startswith('part-'):
+            continue
+        content_type, _, start = name[len('part-'):].partition('.')[0].rpartition('-')
+        covered = (next_rows is not None and name.endswith('.parquet') and start.isdigit()
+                   and int(start) < next_rows.get(content_type, 0))
+        if not covered:
+            os.remove(os.path.join(path, name))
+
+
+class ParquetSink:
+    """Writes each chunk as its own Parquet part file in an output directory."""
+
+    def __init__(self, path: str, checkpoint: Optional[Dict[str, Any]]):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError('Parquet output needs pyarrow; install it or use a .jsonl output.')
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        # Parts are named by start row, so parts of an earlier run that the
+        # checkpoint doesn't cover would otherwise sit next to the new ones
+        remove_stale_parts(path, checkpoint['next_rows'] if checkpoint is not None else None)
+
+    def write(self, content_type: str, records: List[Dict[str, Any]], start: int) -> None:
+        part = os.path.join(self.path, f'part-{content_type}-{start:09d}.parquet')
+        pd.DataFrame(records).to_parquet(part + '.tmp', index=False)
+        os.replace(part + '.tmp', part)
+
+    def position(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        pass
+
+
+def _load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    # Write then rename, so an interruption never leaves a half-written checkpoint
+    with open(path + '.tmp', 'w', encoding='utf-8') as output:
+        json.dump(checkpoint, output, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def export(data_manager, output: str, k: int = 20, chunk_size: int = 256,
+           workers: Optional[int] = None, restart: bool = False) -> None:
+    """
+    Stream the top-K recommendations of every title in every catalog to output.
+
+    Args:
+        data_manager: DataManager with the catalogs to export
+        output: JSONL file, or directory of Parquet parts if it ends in .parquet
+        k: Recommendations per title
+        chunk_size: Titles scored per matrix product
+        workers: Worker processes; defaults to the CPU count
+        restart: Ignore any checkpoint and export from the beginning
+
+    Raises:
+        ValueError: If the checkpoint was written with another chunk_size
+    """
+    checkpoint_path = output.rstrip('/\\') + '.checkpoint.json'
+    catalogs = {content_type: data_manager.get_catalog(content_type)
+                for content_type in data_manager.CONTENT_TYPES}
+    fresh = {
+        'k': k,
+        'chunk_size': chunk_size,
+        'source_hashes': {content_type: catalog.source_hash for content_type, catalog in catalogs.items()},
+        'next_rows': {content_type: 0 for content_type in catalogs},
+        'position': 0,
+    }
+
+    checkpoint = None if restart else _load_checkpoint(checkpoint_path)
+    if checkpoint is not None and (checkpoint['k'] != k or
+                                   checkpoint['source_hashes'] != fresh['source_hashes']):
+        print('Checkpoint was made with different settings or data; starting over.')
+        checkpoint = None
+    if checkpoint is not None and not os.path.exists(output):
+        print('Checkpoint has no matching output; starting over.')
+        checkpoint = None
+    if checkpoint is not None and checkpoint.get('chunk_size') != chunk_size:
+        raise ValueError(
+            f'{checkpoint_path} was written with a chunk size of {checkpoint.get("chunk_size")}; '
+            'resume with the same --chunk-size or pass --restart.'
+        )
+    if checkpoint is not None:
+        print(f'Resuming from {checkpoint_path}')
+
+    workers = workers or os.cpu_count() or 1
+    sink_class = ParquetSink if output.rstrip('/\\').endswith('.parquet') else JSONLSink
+    sink = sink_class(output, checkpoint)
+    checkpoint = checkpoint or fresh
+    try:
+        for content_type, catalog in catalogs.items():
+            titles = catalog.title_index.titles
+            first_row = checkpoint['next_rows'][content_type]
+            bounds = [(start, min(start + chunk_size, len(titles)))
+                      for start in range(first_row, len(titles), chunk_size)]
+            if not bounds:
+                continue
+
+            started = time.perf_counter()
+            exported = 0
+            title_codes = pd.factorize(np.asarray(titles, dtype=object))[0]
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                           initargs=(catalog.feature_index, title_codes, k))
+            try:
+                for (start, stop), (ids, scores) in bounded_ordered_map(
+                        executor, worker_neighbors, bounds, 2 * workers):
+                    records = [
+                        {
+                            'content_type': content_type,
+                            'title': titles[row],
+                            'recommendations': [
+                                {'title': titles[neighbor], 'similarity': float(score)}
+                                for neighbor, score in zip(row_ids, row_scores) if neighbor >= 0
+                            ],
+                        }
+                        for row, row_ids, row_scores in zip(range(start, stop), ids, scores)
+                    ]
+                    sink.write(content_type, records, start)
+                    checkpoint['position'] = sink.position()
+                    checkpoint['next_rows'][content_type] = stop
+                    _save_checkpoint(checkpoint_path, checkpoint)
+
+                    exported += stop - start
+                    rate = exported / (time.perf_counter() - started)
+                    print(f'\r{content_type}: {stop}/{len(titles)} titles, {rate:.0f} titles/sec',
+                          end='', flush=True)
+            finally:
+                # Drop queued chunks on interruption; the checkpoint already
+                # covers everything written so far
+                executor.shutdown(cancel_futures=True)
+
+            elapsed = time.perf_counter() - started
+            print(f'\r{content_type}: exported {exported} titles in {elapsed:.1f}s '
+                  f'({exported / elapsed:.0f} titles/sec)')
+    finally:
+        sink.close()
+
+
+def main():
+    from data_manager import DataManager
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Export top-K recommendations for every title.')
+    parser.add_argument('--movies', default=os.path.join(current_dir, 'movies.csv'),
+                        help='Path to the movies CSV')
+    parser.add_argument('--shows', default=os.path.join(current_dir, 'tv_shows.csv'),
+                        help='Path to the TV shows CSV')
+    parser.add_argument('--output', required=True,
+                        help='Output .jsonl file, or .parquet directory of part files')
+    parser.add_argument('--k', type=int, default=20, help='Recommendations per title')
+    parser.add_argument('--chunk-size', type=int, default=256, help='Titles scored per block')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--restart', action='store_true',
+                        help='Ignore any checkpoint and export from the beginning')
+    args = parser.parse_args()
+
+    data_manager = DataManager(movies_path=args.movies, shows_path=args.shows)
+    try:
+        export(data_manager, args.output, args.k, args.chunk_size, args.workers, args.restart)
+    except KeyboardInterrupt:
+        print('\nInterrupted; run the same command again to resume.')
+        sys.exit(130)
+    except ValueError as error:
+        parser.error(str(error))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from instrumentation import span
+from similarity import SimilarityCalculator
+
+
+def csr_row_range(matrix: sparse.csr_matrix, start: int, stop: int) -> sparse.csr_matrix:
+    """Rows [start, stop) of a CSR matrix as a CSR matrix sharing its data and indices."""
+    if start == 0 and stop == matrix.shape[0]:
+        return matrix
+    first, last = matrix.indptr[start], matrix.indptr[stop]
+    return sparse.csr_matrix(
+        (matrix.data[first:last], matrix.indices[first:last],
+         matrix.indptr[start:stop + 1] - first),
+        shape=(stop - start, matrix.shape[1]), copy=False
+    )
+
+
+class FeatureIndex:
+    """
+    Tokenized, binary sparse representation of a catalog.
+
+    Each feature field (description, genres, title) is stored as a CSR matrix
+    with one row per catalog item and one column per token, so the Jaccard
+    similarity between one item and every other item is a single sparse
+    mat-vec instead of a Python loop over rows.
+    """
+
+    def __init__(self, matrices: Dict[str, sparse.csr_matrix],
+                 vocabulary: Dict[str, int],
+                 weights: Dict[str, float]):
+        """Initialize the index from prebuilt per-field matrices and their shared vocabulary."""
+        self.matrices = matrices
+        self.vocabulary = vocabulary
+        self.weights = weights
+        # Number of distinct tokens per row, i.e. the size of each token set
+        self.set_sizes = {
+            field: np.diff(matrix.indptr) for field, matrix in matrices.items()
+        }
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame,
+                   similarity_calculator: Optional[SimilarityCalculator] = None) -> 'FeatureIndex':
+        """
+        Tokenize every feature field of the frame once and build the index.
+
+        Tokens of all fields are interned into one vocabulary, so a token id
+        means the same word in every field and each row's tokens are stored
+        as a sorted id array (its CSR row) instead of a set of strings.
+        """
+        similarity_calculator = similarity_calculator or SimilarityCalculator()
+        weights = dict(similarity_calculator.FEATURE_WEIGHTS)
+
+        vocabulary: Dict[str, int] = {}
+        rows = {}
+        for field in weights:
+            if field in frame.columns:
+                values = frame[field].fillna('').astype(str).tolist()
+            else:
+                values = [''] * len(frame)
+            token_sets = (similarity_calculator._tokenize(value) for value in values)
+            with span('tokenization'):
+                rows[field] = cls._intern_rows(token_sets, vocabulary)
+
+        # Every field's matrix spans the whole shared vocabulary
+        matrices = {
+            field: cls._build_matrix(indptr, indices, len(frame), len(vocabulary))
+            for field, (indptr, indices) in rows.items()
+        }
+        return cls(matrices, vocabulary, weights)
+
+    @classmethod
+    def concat(cls, indexes: Sequence['FeatureIndex']) -> 'FeatureIndex':
+        """
+        Stack the rows of several indexes into one index over a merged vocabulary.
+
+        Token ids of the first index are kept; later indexes have theirs
+        remapped, so every row keeps exactly its token set and scores between
+        rows are unchanged.
+        """
+        weights = indexes[0].weights
+        vocabulary = dict(indexes[0].vocabulary)
+        token_maps = []
+        for index in indexes:
+            if index.weights != weights:
+                raise ValueError('Feature indexes with different weights cannot be combined.')
+            tokens = sorted(index.vocabulary, key=index.vocabulary.get)
+            token_maps.append(np.array(
+                [vocabulary.setdefault(token, len(vocabulary)) for token in tokens], dtype=np.int32
+            ))
+
+        matrices = {}
+        for field in weights:
+            parts = []
+            for index, token_map in zip(indexes, token_maps):
+                matrix = index.matrices[field]
+                part = sparse.csr_matrix(
+                    (np.array(matrix.data), token_map[matrix.indices], np.array(matrix.indptr)),
+                    shape=(matrix.shape[0], len(vocabulary))
+                )
+                part.sort_indices()
+                parts.append(part)
+            matrices[field] = sparse.vstack(parts, format='csr')
+        return cls(matrices, vocabulary, weights)
+
+    @staticmethod
+    def _intern_rows(token_sets: Iterable[FrozenSet[str]], vocabulary: Dict[str, int]):
+        """Intern each row's tokens into vocabulary and return CSR indptr and indices lists."""
+        indptr = [0]
+        indices: List[int] = []
+        for tokens in token_sets:
+            # Visit tokens in sorted order so ids don't depend on set iteration order
+            indices.extend(sorted(vocabulary.setdefault(token, len(vocabulary)) for token in sorted(tokens)))
+            indptr.append(len(indices))
+        return indptr, indices
+
+    @staticmethod
+    def _build_matrix(indptr: List[int], indices: List[int], row_count: int,
+                      column_count: int) -> sparse.csr_matrix:
+        """Build a binary CSR matrix from per-row sorted token ids."""
+        return sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.int32),
+             np.asarray(indices, dtype=np.int32),
+             np.asarray(indptr, dtype=np.int32)),
+            shape=(row_count, column_count)
+        )
+
+    def with_rows(self, kept_rows: Sequence[int], frame: pd.DataFrame, changed_rows: Sequence[int],
+                  similarity_calculator: Optional[SimilarityCalculator] = None) -> 'FeatureIndex':
+        """
+        Build the index of an edited catalog, re-tokenizing only the rows that changed.
+
+        The new catalog's rows are this index's kept_rows, in order, followed
+        by any appended rows. The index is copied rather than modified, so
+        readers of this index are unaffected.
+
+        Args:
+            kept_rows: Rows of this index that remain, in their new order
+            frame: Frame of the edited catalog
+            changed_rows: Rows of the new catalog whose fields are new or
+                edited, including every appended row
+            similarity_calculator: Tokenizer to use; defaults to a new one
+
+        Returns:
+            The feature index of the edited catalog
+        """
+        similarity_calculator = similarity_calculator or SimilarityCalculator()
+        kept_rows = np.asarray(kept_rows, dtype=np.intp)
+        changed_rows = np.asarray(changed_rows, dtype=np.intp)
+        row_count = len(frame)
+
+        # New tokens are interned into a copy so the old vocabulary stays consistent
+        vocabulary = dict(self.vocabulary)
+        rows = {}
+        for field in self.weights:
+            if field in frame.columns:
+                values = frame[field].iloc[changed_rows].fillna('').astype(str).tolist()
+            else:
+                values = [''] * len(changed_rows)
+            token_sets = (similarity_calculator._tokenize(value) for value in values)
+            with span('tokenization'):
+                rows[field] = self._intern_rows(token_sets, vocabulary)
+
+        # Stack the kept rows on top of the re-tokenized ones, then pick each new
+        # row from whichever part holds its current tokens
+        order = np.arange(row_count)
+        order[changed_rows] = len(kept_rows) + np.arange(len(changed_rows))
+        matrices = {}
+        for field, (indptr, indices) in rows.items():
+            kept = self.matrices[field][kept_rows]
+            kept.resize((len(kept_rows), len(vocabulary)))
+            changed = self._build_matrix(indptr, indices, len(changed_rows), len(vocabulary))
+            matrices[field] = sparse.vstack([kept, changed], format='csr')[order]
+        return FeatureIndex(matrices, vocabulary, self.weights)
+
+    def token_ids(self, field: str, row: int) -> np.ndarray:
+        """Sorted vocabulary ids of one row's tokens in a field."""
+        matrix = self.matrices[field]
+        return matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]
+
+    def __len__(self) -> int:
+        return len(next(iter(self.set_sizes.values()))) if self.set_sizes else 0
+
+    def _row_range(self, field: str, start: int, stop: int) -> sparse.csr_matrix:
+        """Rows [start, stop) of a field's matrix as a CSR view sharing its arrays."""
+        return csr_row_range(self.matrices[field], start, stop)
+
+    def jaccard_similarity(self, field: str, row: int, start: int = 0,
+                           stop: Optional[int] = None) -> np.ndarray:
+        """Jaccard similarity of one row's token set against rows [start, stop) for a field."""
+        matrix = self.matrices[field]
+        stop = matrix.shape[0] if stop is None else stop
+        sizes = self.set_sizes[field][start:stop]
+        query_size = self.set_sizes[field][row]
+        if query_size == 0:
+            return np.zeros(stop - start)
+
+        query = np.zeros(matrix.shape[1], dtype=np.int32)
+        query[matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]] = 1
+        intersection = self._row_range(field, start, stop).dot(query).astype(np.float64)
+        union = sizes + query_size - intersection
+
+        similarity = np.zeros(stop - start)
+        # Empty token sets have zero similarity, matching calculate_jaccard_similarity
+        nonempty = sizes > 0
+        np.divide(intersection, union, out=similarity, where=nonempty)
+        return similarity
+
+    def jaccard_similarity_to_rows(self, field: str, row: int, rows: Sequence[int]) -> np.ndarray:
+        """Jaccard similarity of one row's token set against selected rows for a field."""
+        matrix = self.matrices[field]
+        rows = np.asarray(rows, dtype=np.intp)
+        sizes = self.set_sizes[field][rows]
+        query_size = self.set_sizes[field][row]
+        if query_size == 0:
+            return np.zeros(len(rows))
+
+        query = np.zeros(matrix.shape[1], dtype=np.int32)
+        query[matrix.indices[matrix.indptr[row]:matrix.indptr[row + 1]]] = 1
+        intersection = matrix[rows].dot(query).astype(np.float64)
+        union = sizes + query_size - intersection
+
+        similarity = np.zeros(len(rows))
+        np.divide(intersection, union, out=similarity, where=sizes > 0)
+        return similarity
+
+    def similarity_to_rows(self, row: int, rows: Sequence[int]) -> np.ndarray:
+        """Weighted content similarity of one row against selected rows only."""
+        scores = np.zeros(len(rows))
+        for field, weight in self.weights.items():
+            scores += weight * self.jaccard_similarity_to_rows(field, row, rows)
+        return scores
+
+    def similarity(self, row: int, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Weighted content similarity of one row against every row in the catalog.
+
+        Produces the same scores as SimilarityCalculator.calculate_content_similarity
+        applied pairwise, accumulated in the same order. start and stop limit
+        scoring to a range of rows, e.g. one shard of a parallel scan.
+        """
+        stop = len(self) if stop is None else stop
+        scores = np.zeros(stop - start)
+        for field, weight in self.weights.items():
+            scores += weight * self.jaccard_similarity(field, row, start, stop)
+        return scores
+
+    def jaccard_similarity_block(self, field: str, rows: Sequence[int], start: int = 0,
+                                 stop: Optional[int] = None) -> np.ndarray:
+        """Jaccard similarity of several rows against rows [start, stop) for a field, as a dense block."""
+        matrix = self.matrices[field]
+        stop = matrix.shape[0] if stop is None else stop
+        sizes = self.set_sizes[field]
+        rows = np.asarray(rows, dtype=np.intp)
+
+        # N x R sparse product keeps the conversion work on the small query side;
+        # only pairs sharing a token have a nonzero intersection (and similarity)
+        intersection = self._row_range(field, start, stop).dot(matrix[rows].T).tocoo()
+        shared = intersection.data.astype(np.float64)
+        union = sizes[rows][intersection.col] + sizes[start + intersection.row] - shared
+
+        similarity = np.zeros((len(rows), stop - start))
+        similarity[intersection.col, intersection.row] = shared / union
+        return similarity
+
+    def similarity_block(self, rows: Sequence[int], start: int = 0,
+                         stop: Optional[int] = None) -> np.ndarray:
+        """
+        Weighted content similarity of several rows against every row.
+
+        Returns:
+            len(rows) x len(self) array, or len(rows) x (stop - start) when a
+            row range is given; row i equals similarity(rows[i], start, stop)
+        """
+        stop = len(self) if stop is None else stop
+        scores = np.zeros((len(rows), stop - start))
+        for field, weight in self.weights.items():
+            scores += weight * self.jaccard_similarity_block(field, rows, start, stop)
+        return scores
@@ -0,0 +1,206 @@
+"""
+Timing spans and Prometheus metrics for the recommendation hot path.
+
+Code on the hot path wraps each stage in a span:
+
+    with span('scoring'):
+        scores = feature_index.similarity(row)
+
+Every span feeds the recommender_stage_seconds histogram, which the backend
+serves with its other metrics in the Prometheus text format on /metrics. While
+a request is being profiled (see profile()), spans also record a per-request
+stage breakdown.
+
+Spans are on unless RECOMMENDER_METRICS=0. When they are off and no profile
+is active, span() returns a shared no-op context manager, so an instrumented
+call costs one function call.
+
+Metrics are kept per process; with a multi-worker server each worker exports
+its own, and stages that run in a process scoring pool are not exported.
+"""
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import bisect
+import os
+import threading
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Prometheus label set, e.g. {stage="scoring"}; empty if there are no labels."""
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        """Add amount to the counter for a label combination."""
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        """Exposition lines for this counter."""
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f'{self.name}{_format_labels(self.label_names, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, as Prometheus expects."""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # Label values -> (per-bucket counts with a final +Inf bucket, sum)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Record one observation for a label combination."""
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                label_values, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[bucket] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        """Exposition lines for this histogram."""
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            values = sorted((labels, (list(counts), total[0]))
+                            for labels, (counts, total) in self._values.items())
+        for label_values, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.label_names + ('le',), label_values + (le,))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+        """Create and register a counter."""
+        counter = Counter(name, description, label_names)
+        self._metrics.append(counter)
+        return counter
+
+    def histogram(self, name: str, description: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Create and register a histogram."""
+        histogram = Histogram(name, description, label_names, buckets)
+        self._metrics.append(histogram)
+        return histogram
+
+    def add_collector(self, collector: Callable[[], List[str]]) -> None:
+        """Register a function returning extra exposition lines, called on every render."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+stage_seconds = registry.histogram(
+    'recommender_stage_seconds', 'Time spent in each stage of the recommendation path.', ('stage',)
+)
+
+enabled = os.environ.get('RECOMMENDER_METRICS', '1') != '0'
+
+# (stage, seconds) pairs recorded for the request being profiled, if any
+_profile: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('profile', default=None)
+_disabled_span = nullcontext()
+
+
+class _Span:
+    """Times one stage and records it in the stage histogram and active profile."""
+
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> '_Span':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.started
+        if enabled:
+            stage_seconds.observe(elapsed, self.stage)
+        stages = _profile.get()
+        if stages is not None:
+            stages.append((self.stage, elapsed))
+
+
+def span(stage: str):
+    """Context manager timing one stage; a shared no-op when instrumentation is off."""
+    if enabled or _profile.get() is not None:
+        return _Span(stage)
+    return _disabled_span
+
+
+@contextmanager
+def profile() -> Iterator[List[Tuple[str, float]]]:
+    """Collect the (stage, seconds) spans recorded in this context until exit."""
+    stages: List[Tuple[str, float]] = []
+    token = _profile.set(stages)
+    try:
+        yield stages
+    finally:
+        _profile.reset(token)
+
+
+def server_timing(stages: List[Tuple[str, float]]) -> str:
+    """
+    Format a stage breakdown as a Server-Timing header value.
+
+    Repeated stages are summed and listed in order of first appearance,
+    with durations in milliseconds.
+    """
+    totals: Dict[str, float] = {}
+    for stage, seconds in stages:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ', '.join(f'{stage};dur={seconds * 1000:.3f}' for stage, seconds in totals.items())
@@ -0,0 +1,205 @@
+"""
+MinHash LSH candidate generation for the Jaccard content similarity.
+
+Every similarity signal is a Jaccard similarity over token sets, which MinHash
+approximates: the probability that two sets get the same minimum hash equals
+their Jaccard similarity. Each position of an item's signature is the MinHash
+of one feature field (description, genres or title), with fields assigned to
+positions in proportion to their weight, so two items agree on a position with
+probability equal to their weighted content similarity. Signatures are split
+into bands, and items that share a bucket in any band become candidates. Only
+the candidates are then scored exactly, so a query touches a small fraction of
+a large catalog.
+
+Run 'python backend/lsh.py' to measure recall@K against the exact full scan.
+"""
+from typing import Dict, Tuple
+import argparse
+import os
+import time
+import numpy as np
+from feature_index import FeatureIndex
+from topk import top_k_rows
+
+# Mersenne prime used by the universal hash family (a * x + b) mod p
+_PRIME = (1 << 31) - 1
+
+
+class MinHashLSH:
+    """Banded MinHash index over the combined feature tokens of a catalog."""
+
+    def __init__(self, feature_index: FeatureIndex, bands: int = 24, rows_per_band: int = 3,
+                 seed: int = 0, rows_per_chunk: int = 4096):
+        """
+        Hash every item of the feature index into banded buckets.
+
+        Args:
+            feature_index: Feature index of the catalog
+            bands: Number of bands; more bands raise recall and candidate count
+            rows_per_band: Signature values per band; more rows make buckets stricter
+            seed: Seed of the hash family
+            rows_per_chunk: Items hashed per step, bounding memory while building
+        """
+        self.bands = bands
+        self.rows_per_band = rows_per_band
+
+        signatures = self._signatures(feature_index, bands * rows_per_band, seed, rows_per_chunk)
+
+        # Per band, group rows by their band signature: bucket id of every row,
+        # plus rows ordered by bucket with the offset where each bucket starts
+        self._row_buckets = []
+        self._bucket_members = []
+        self._bucket_starts = []
+        for band in range(bands):
+            band_signature = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+            _, buckets = np.unique(band_signature, axis=0, return_inverse=True)
+            buckets = buckets.ravel()
+            members = np.argsort(buckets, kind='stable')
+            starts = np.searchsorted(buckets[members], np.arange(buckets.max() + 2))
+            self._row_buckets.append(buckets)
+            self._bucket_members.append(members)
+            self._bucket_starts.append(starts)
+
+    @staticmethod
+    def _signatures(feature_index: FeatureIndex, hash_count: int, seed: int,
+                    rows_per_chunk: int) -> np.ndarray:
+        """
+        MinHash signature of every row.
+
+        Each signature position is assigned to a feature field with probability
+        equal to the field's weight and holds the minimum of one hash over that
+        field's tokens.
+        """
+        random = np.random.default_rng(seed)
+        fields = list(feature_index.weights)
+        weights = np.array([feature_index.weights[field] for field in fields])
+        hash_fields = random.choice(len(fields), size=hash_count, p=weights / weights.sum())
+        a = random.integers(1, _PRIME, size=hash_count, dtype=np.uint64)
+        b = random.integers(0, _PRIME, size=hash_count, dtype=np.uint64)
+
+        # An empty token set has zero similarity to everything, so its rows get
+        # a value no other row shares instead of a common "empty" value
+        row_count = len(feature_index)
+        signatures = np.repeat(
+            _PRIME + np.arange(row_count, dtype=np.uint64)[:, None], hash_count, axis=1
+        )
+        for field_number, field in enumerate(fields):
+            positions = (hash_fields == field_number).nonzero()[0]
+            if len(positions) == 0:
+                continue
+            matrix = feature_index.matrices[field]
+            for start in range(0, row_count, rows_per_chunk):
+                stop = min(start + rows_per_chunk, row_count)
+                indptr = matrix.indptr[start:stop + 1]
+                token_ids = matrix.indices[indptr[0]:indptr[-1]].astype(np.uint64)
+                if len(token_ids) == 0:
+                    continue
+                hashes = (token_ids[:, None] * a[positions] + b[positions]) % _PRIME
+
+                # reduceat needs a valid start offset for every row, so only
+                # rows with tokens are reduced
+                offsets = indptr[:-1] - indptr[0]
+                nonempty = (np.diff(indptr) > 0).nonzero()[0]
+                signatures[(start + nonempty)[:, None], positions[None, :]] = np.minimum.reduceat(
+                    hashes, offsets[nonempty], axis=0
+                )
+        return signatures
+
+    def candidates(self, row: int) -> np.ndarray:
+        """Rows sharing at least one band bucket with a row, excluding the row itself."""
+        found = []
+        for buckets, members, starts in zip(self._row_buckets, self._bucket_members,
+                                            self._bucket_starts):
+            bucket = buckets[row]
+            if bucket >= 0:
+                found.append(members[starts[bucket]:starts[bucket + 1]])
+        if not found:
+            return np.zeros(0, dtype=np.intp)
+        candidates = np.unique(np.concatenate(found))
+        return candidates[candidates != row]
+
+
+class LSHCandidateGenerator:
+    """Builds and caches one MinHash LSH index per catalog for ContentRecommender."""
+
+    def __init__(self, bands: int = 24, rows_per_band: int = 3, seed: int = 0):
+        """Initialize the generator with the band layout used for every catalog."""
+        self.bands = bands
+        self.rows_per_band = rows_per_band
+        self.seed = seed
+        self._indexes: Dict[str, Tuple[FeatureIndex, MinHashLSH]] = {}
+
+    def index_for(self, catalog) -> MinHashLSH:
+        """LSH index of a catalog, rebuilt when the catalog's feature index changes."""
+        cached = self._indexes.get(catalog.content_type)
+        if cached is not None and cached[0] is catalog.feature_index:
+            return cached[1]
+        index = MinHashLSH(catalog.feature_index, self.bands, self.rows_per_band, self.seed)
+        self._indexes[catalog.content_type] = (catalog.feature_index, index)
+        return index
+
+    def candidates(self, catalog, row: int) -> np.ndarray:
+        """Candidate rows for a query row of a catalog."""
+        return self.index_for(catalog).candidates(row)
+
+
+def main():
+    from data_manager import DataManager
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Benchmark LSH recall@K against the exact scan.')
+    parser.add_argument('--movies', default=os.path.join(current_dir, 'movies.csv'),
+                        help='Path to the movies CSV')
+    parser.add_argument('--shows', default=os.path.join(current_dir, 'tv_shows.csv'),
+                        help='Path to the TV shows CSV')
+    parser.add_argument('--bands', type=int, default=24, help='Number of bands')
+    parser.add_argument('--rows', type=int, default=3, help='Signature values per band')
+    parser.add_argument('--k', type=int, default=10, help='Recommendations per query')
+    parser.add_argument('--queries', type=int, default=500, help='Query titles per catalog')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for hashing and query sampling')
+    args = parser.parse_args()
+
+    data_manager = DataManager(movies_path=args.movies, shows_path=args.shows)
+    for content_type in data_manager.CONTENT_TYPES:
+        catalog = data_manager.get_catalog(content_type)
+        feature_index = catalog.feature_index
+        nothing_excluded = np.zeros(len(catalog), dtype=bool)
+
+        started = time.perf_counter()
+        index = MinHashLSH(feature_index, args.bands, args.rows, args.seed)
+        build_seconds = time.perf_counter() - started
+
+        queries = np.random.default_rng(args.seed).choice(
+            len(catalog), size=min(args.queries, len(catalog)), replace=False
+        )
+        recalls = []
+        candidate_counts = []
+        exact_seconds = 0.0
+        lsh_seconds = 0.0
+        for row in queries:
+            started = time.perf_counter()
+            exact_excluded = nothing_excluded.copy()
+            exact_excluded[row] = True
+            exact = top_k_rows(feature_index.similarity(row), args.k, exact_excluded)
+            exact_seconds += time.perf_counter() - started
+
+            started = time.perf_counter()
+            candidates = index.candidates(row)
+            scores = feature_index.similarity_to_rows(row, candidates)
+            approximate = candidates[top_k_rows(scores, args.k)]
+            lsh_seconds += time.perf_counter() - started
+
+            if len(exact):
+                recalls.append(len(np.intersect1d(exact, approximate)) / len(exact))
+            candidate_counts.append(len(candidates))
+
+        print(f'{content_type}: bands={args.bands} rows={args.rows} built in {build_seconds:.2f}s')
+        print(f'  recall@{args.k}: {np.mean(recalls):.3f}')
+        print(f'  candidates per query: {np.mean(candidate_counts):.0f} '
+              f'({np.mean(candidate_counts) / len(catalog):.1%} of {len(catalog)} titles)')
+        print(f'  latency per query: exact {exact_seconds / len(queries) * 1000:.2f} ms, '
+              f'LSH {lsh_seconds / len(queries) * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""
+Offline top-K neighbor table for item-to-item content similarity.
+
+Similarity between catalog items only changes when the catalog does, so the K
+most similar items of every title can be computed ahead of time and served with
+an array lookup. The table is stored next to the catalog cache, keyed by the
+source file hash:
+
+    movies.cache/neighbors-v1-<sha256>/
+        meta.json      K, row count, source hash
+        ids.npy        int32 (rows x K) neighbor row ids, -1 where fewer exist
+        scores.npy     float32 (rows x K) neighbor similarity scores
+
+Build it with 'python backend/neighbors.py'.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Sequence, Tuple
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from catalog_cache import cache_root
+from feature_index import FeatureIndex
+from topk import top_k_rows
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+NEIGHBORS_VERSION = 1
+
+
+class NeighborTable:
+    """Precomputed top-K neighbors of every row in a catalog."""
+
+    def __init__(self, ids: np.ndarray, scores: np.ndarray):
+        """Initialize the table from (rows x K) id and score arrays."""
+        self.ids = ids
+        self.scores = scores
+
+    @property
+    def k(self) -> int:
+        """Number of neighbors stored per row."""
+        return self.ids.shape[1]
+
+    def __len__(self) -> int:
+        return self.ids.shape[0]
+
+    def neighbors(self, row: int, count: int) -> np.ndarray:
+        """Best count neighbor row ids of a row, best first."""
+        ids = self.ids[row, :count]
+        return ids[ids >= 0]
+
+
+def table_dir(source_path: str, source_hash: str) -> str:
+    """Directory of the neighbor table for one version of a source CSV."""
+    return os.path.join(cache_root(source_path),
+                        f'neighbors-v{NEIGHBORS_VERSION}-{source_hash}')
+
+
+def save_table(table: NeighborTable, source_path: str, source_hash: str) -> str:
+    """
+    Write a neighbor table next to the catalog cache.
+
+    Returns:
+        Path of the table directory
+    """
+    root = cache_root(source_path)
+    target = table_dir(source_path, source_hash)
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=root)
+
+    try:
+        np.save(os.path.join(staging, 'ids.npy'), table.ids)
+        np.save(os.path.join(staging, 'scores.npy'), table.scores)
+        meta = {
+            'neighbors_version': NEIGHBORS_VERSION,
+            'source_hash': source_hash,
+            'rows': len(table),
+            'k': table.k,
+        }
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as output:
+            json.dump(meta, output, indent=2)
+
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+def load_table(source_path: str, source_hash: str) -> Optional[NeighborTable]:
+    """
+    Load the neighbor table built for a source file, memory-mapped read-only.
+
+    Returns:
+        The table, or None if none has been built for this source hash
+    """
+    directory = table_dir(source_path, source_hash)
+    meta_path = os.path.join(directory, 'meta.json')
+    if not os.path.isfile(meta_path):
+        return None
+
+    with open(meta_path, encoding='utf-8') as source:
+        meta = json.load(source)
+    if meta.get('neighbors_version') != NEIGHBORS_VERSION or meta.get('source_hash') != source_hash:
+        return None
+
+    return NeighborTable(
+        np.load(os.path.join(directory, 'ids.npy'), mmap_mode='r'),
+        np.load(os.path.join(directory, 'scores.npy'), mmap_mode='r'),
+    )
+
+
+# State shared with pool workers, set once per worker by init_worker
+_worker_state = {}
+
+
+def init_worker(feature_index: FeatureIndex, title_codes: np.ndarray, k: int) -> None:
+    """Process pool initializer: keep the catalog a worker scores chunks of."""
+    _worker_state['feature_index'] = feature_index
+    _worker_state['title_codes'] = title_codes
+    _worker_state['k'] = k
+
+
+def top_neighbors(feature_index: FeatureIndex, title_codes: np.ndarray, start: int, stop: int,
+                  k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-K neighbors of the rows in [start, stop), scored as one block.
+
+    Args:
+        feature_index: Feature index of the catalog
+        title_codes: Integer code per row, equal for rows with the same title
+        start: First row of the block
+        stop: Row after the last row of the block
+        k: Number of neighbors per row
+
+    Returns:
+        (ids, scores) arrays of shape (stop - start) x k; rows with fewer than
+        k candidates are padded with id -1 and score 0
+    """
+    rows = range(start, stop)
+    return _block_neighbors(feature_index.similarity_block(rows), rows, title_codes, k)
+
+
+def _block_neighbors(block: np.ndarray, rows: Sequence[int], title_codes: np.ndarray,
+                     k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-K neighbors of each row from its precomputed similarity_block row."""
+    ids = np.full((len(rows), k), -1, dtype=np.int32)
+    scores = np.zeros((len(rows), k))
+    for offset, row in enumerate(rows):
+        # Exclude the row itself and any other row with the same title,
+        # matching find_similar_content
+        top_rows = top_k_rows(block[offset], k, title_codes == title_codes[row])
+        ids[offset, :len(top_rows)] = top_rows
+        scores[offset, :len(top_rows)] = block[offset, top_rows]
+    return ids, scores
+
+
+def worker_neighbors(bounds: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-K neighbor ids and exact scores of the rows in [start, stop), in a worker set up by init_worker."""
+    return top_neighbors(_worker_state['feature_index'], _worker_state['title_codes'],
+                         bounds[0], bounds[1], _worker_state['k'])
+
+
+def _score_chunk(bounds: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-K neighbors of the rows in [start, stop), with compact float32 scores."""
+    ids, scores = worker_neighbors(bounds)
+    return ids, scores.astype(np.float32)
+
+
+def build_table(feature_index: FeatureIndex, titles, k: int = 50,
+                chunk_size: int = 256, workers: Optional[int] = None) -> NeighborTable:
+    """
+    Compute the top-K neighbors of every row.
+
+    Rows are scored in chunks of chunk_size against the whole catalog, so peak
+    memory is about chunk_size x rows floats per worker regardless of catalog
+    size. Chunks are spread across a process pool.
+
+    Args:
+        feature_index: Feature index of the catalog
+        titles: Title of every row, used to exclude same-title rows
+        k: Number of neighbors to keep per row
+        chunk_size: Rows scored per block
+        workers: Number of worker processes; defaults to the CPU count
+
+    Returns:
+        The neighbor table
+    """
+    row_count = len(feature_index)
+    title_codes = pd.factorize(np.asarray(titles, dtype=object))[0]
+    bounds = [(start, min(start + chunk_size, row_count))
+              for start in range(0, row_count, chunk_size)]
+
+    ids = np.full((row_count, k), -1, dtype=np.int32)
+    scores = np.zeros((row_count, k), dtype=np.float32)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(feature_index, title_codes, k)) as executor:
+        for (start, stop), (chunk_ids, chunk_scores) in zip(bounds, executor.map(_score_chunk, bounds)):
+            ids[start:stop] = chunk_ids
+            scores[start:stop] = chunk_scores
+
+    return NeighborTable(ids, scores)
+
+
+def update_table(table: NeighborTable, feature_index: FeatureIndex, titles,
+                 kept_rows: Sequence[int], changed_rows: Sequence[int],
+                 chunk_size: int = 256) -> NeighborTable:
+    """
+    Neighbor table of an edited catalog, rescoring only the rows the edit can affect.
+
+    Rows are renumbered as in FeatureIndex.with_rows: the table's kept_rows in
+    order, then appended rows. A row's neighbors are recomputed in full only
+    if it changed itself or one of its neighbors was removed or changed.
+    Every other row keeps its unchanged neighbors and only has to consider
+    the changed rows, which can push out its weakest neighbor. The result
+    equals a full build_table of the edited catalog.
+
+    Args:
+        table: Neighbor table of the catalog before the edit
+        feature_index: Feature index of the edited catalog
+        titles: Title of every row of the edited catalog
+        kept_rows: Rows of the old catalog that remain, in their new order
+        changed_rows: Rows of the new catalog that are new or edited
+        chunk_size: Rows scored per block
+
+    Returns:
+        The new neighbor table; the old one is left untouched
+    """
+    k = table.k
+    row_count = len(feature_index)
+    kept_rows = np.asarray(kept_rows, dtype=np.intp)
+    changed_rows = np.unique(np.asarray(changed_rows, dtype=np.intp))
+    title_codes = pd.factorize(np.asarray(titles, dtype=object))[0]
+
+    # Old row id -> new row id, or -1 for removed rows
+    new_rows = np.full(len(table), -1, dtype=np.intp)
+    new_rows[kept_rows] = np.arange(len(kept_rows))
+    changed = np.zeros(row_count, dtype=bool)
+    changed[changed_rows] = True
+
+    ids = np.full((row_count, k), -1, dtype=np.int32)
+    scores = np.zeros((row_count, k), dtype=np.float32)
+    old_ids = np.asarray(table.ids[kept_rows])
+    remapped = np.where(old_ids >= 0, new_rows[old_ids], -1)
+    ids[:len(kept_rows)] = remapped
+    scores[:len(kept_rows)] = table.scores[kept_rows]
+
+    # Rows that lost a neighbor or whose neighbor's score changed
+    stale = np.zeros(row_count, dtype=bool)
+    stale[:len(kept_rows)] = ((old_ids >= 0) & ((remapped < 0) | changed[remapped])).any(axis=1)
+    stale |= changed
+
+    # Score of each row's weakest neighbor; a changed row can only enter a
+    # list if it scores at least that (allowing for float32 rounding)
+    threshold = np.where(ids[:, -1] >= 0, scores[:, -1].astype(np.float64) - 1e-6, -np.inf)
+    entrants = {}
+    for start in range(0, len(changed_rows), chunk_size):
+        rows = changed_rows[start:start + chunk_size]
+        block = feature_index.similarity_block(rows)
+        ids[rows], scores[rows] = _block_neighbors(block, rows, title_codes, k)
+        for offset, row in enumerate(rows):
+            hits = (block[offset] >= threshold) & ~stale & (title_codes != title_codes[row])
+            for target in hits.nonzero()[0]:
+                entrants.setdefault(target, []).append(row)
+
+    # Changed rows that may enter an otherwise unaffected list compete with its
+    # current neighbors, rescored exactly so ties break as in a full scan
+    for row, rows in entrants.items():
+        candidates = np.union1d(ids[row][ids[row] >= 0], rows)
+        candidate_scores = feature_index.similarity_to_rows(row, candidates)
+        top = top_k_rows(candidate_scores, k)
+        ids[row] = -1
+        scores[row] = 0
+        ids[row, :len(top)] = candidates[top]
+        scores[row, :len(top)] = candidate_scores[top]
+
+    rescored = (stale & ~changed).nonzero()[0]
+    for start in range(0, len(rescored), chunk_size):
+        rows = rescored[start:start + chunk_size]
+        ids[rows], scores[rows] = _block_neighbors(
+            feature_index.similarity_block(rows), rows, title_codes, k
+        )
+
+    return NeighborTable(ids, scores)
+
+
+def _peak_memory_mb() -> Optional[Tuple[float, float]]:
+    """Peak resident memory of this process and of its largest finished child, in MB."""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024)
+
+
+def main():
+    from data_manager import DataManager
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Build the top-K neighbor tables.')
+    parser.add_argument('--movies', default=os.path.join(current_dir, 'movies.csv'),
+                        help='Path to the movies CSV')
+    parser.add_argument('--shows', default=os.path.join(current_dir, 'tv_shows.csv'),
+                        help='Path to the TV shows CSV')
+    parser.add_argument('--k', type=int, default=50, help='Neighbors to keep per title')
+    parser.add_argument('--chunk-size', type=int, default=256, help='Rows scored per block')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    data_manager = DataManager(movies_path=args.movies, shows_path=args.shows)
+    for content_type in data_manager.CONTENT_TYPES:
+        catalog = data_manager.get_catalog(content_type)
+        started = time.perf_counter()
+        table = build_table(catalog.feature_index, catalog.title_index.titles,
+                            args.k, args.chunk_size, args.workers)
+        elapsed = time.perf_counter() - started
+        path = save_table(table, catalog.source_path, catalog.source_hash)
+        print(f'{content_type}: {len(table)} titles x {table.k} neighbors in {elapsed:.2f}s -> {path}')
+
+    peak = _peak_memory_mb()
+    if peak is not None:
+        print(f'Peak memory: {peak[0]:.1f} MB main process, {peak[1]:.1f} MB largest worker')
+
+
+if __name__ == '__main__':
+    main()
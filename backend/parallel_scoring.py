@@ -0,0 +1,144 @@
+"""
+Parallel full-catalog scoring for large catalogs.
+
+A full scan scores a query against every row. ParallelScorer splits the rows
+into contiguous shards and scores the shards on a thread pool. It keeps each
+shard's top-K and merges those into the overall top-K. The sparse products
+and NumPy array operations of the scoring kernels release the GIL, so shards
+run on separate cores without copying the feature arrays into worker
+processes.
+
+Results are identical to the serial scan:
+- each score is computed the same way whatever shard holds the row;
+- the overall top-K is always among the per-shard top-Ks;
+- ties are broken by row id in both cases.
+
+Catalogs below serial_threshold rows are scored serially, since the thread
+handoff would cost more than the scan.
+
+Run 'python backend/benchmark.py --cores 1 2 4' for the scaling curve.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+import os
+import threading
+import numpy as np
+from topk import top_k_rows
+
+# Catalogs smaller than this are scanned serially
+SERIAL_THRESHOLD = 50000
+# Smallest shard worth a task; below this, per-task overhead dominates
+MIN_SHARD_ROWS = 20000
+
+
+class ParallelScorer:
+    """Scores catalog rows in shards on a thread pool and merges the per-shard top-K."""
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 serial_threshold: int = SERIAL_THRESHOLD,
+                 min_shard_rows: int = MIN_SHARD_ROWS):
+        """
+        Initialize the scorer.
+
+        Args:
+            max_workers: Scoring threads; defaults to the CPU count. 1 always
+                scores serially
+            serial_threshold: Catalogs with fewer rows are scored serially
+            min_shard_rows: Smallest shard size used when splitting a catalog
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.serial_threshold = serial_threshold
+        self.min_shard_rows = min_shard_rows
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ParallelScorer':
+        """Build a scorer from the RECOMMENDER_PARALLEL_* environment variables."""
+        workers = os.environ.get('RECOMMENDER_PARALLEL_WORKERS')
+        threshold = os.environ.get('RECOMMENDER_PARALLEL_THRESHOLD')
+        return cls(
+            max_workers=int(workers) if workers else None,
+            serial_threshold=int(threshold) if threshold else SERIAL_THRESHOLD,
+        )
+
+    def shard_bounds(self, row_count: int) -> List[Tuple[int, int]]:
+        """
+        Split rows into contiguous shards, one per worker unless that makes
+        them smaller than min_shard_rows; a single shard means a serial scan.
+        """
+        if self.max_workers <= 1 or row_count < self.serial_threshold:
+            return [(0, row_count)]
+        shard_rows = max(self.min_shard_rows, -(-row_count // self.max_workers))
+        return [(start, min(start + shard_rows, row_count))
+                for start in range(0, row_count, shard_rows)]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Executor owned by the current process, created on first use."""
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='shard'
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def top_k(self, score_range: Callable[[int, int], np.ndarray], row_count: int, count: int,
+              excluded: Optional[Sequence[np.ndarray]] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top count rows for each of several queries over the whole catalog.
+
+        Args:
+            score_range: Function taking (start, stop) and returning the
+                queries x (stop - start) scores of rows [start, stop)
+            row_count: Number of rows in the catalog
+            count: Number of rows to keep per query
+            excluded: Optional boolean mask over all rows per query; masked
+                rows are never returned
+
+        Returns:
+            One (rows, scores) pair per query, best first, ties broken by row id
+        """
+        bounds = self.shard_bounds(row_count)
+        if len(bounds) == 1:
+            return _shard_top_k(score_range, 0, row_count, count, excluded)
+
+        executor = self._get_executor()
+        futures = [
+            executor.submit(_shard_top_k, score_range, start, stop, count, excluded)
+            for start, stop in bounds
+        ]
+        shard_results = [future.result() for future in futures]
+
+        merged = []
+        for query_results in zip(*shard_results):
+            rows = np.concatenate([shard_rows for shard_rows, _ in query_results])
+            scores = np.concatenate([shard_scores for _, shard_scores in query_results])
+            # Put candidates in row order so top_k_rows breaks ties by row id,
+            # as a serial scan does
+            order = np.argsort(rows, kind='stable')
+            rows, scores = rows[order], scores[order]
+            top = top_k_rows(scores, count)
+            merged.append((rows[top], scores[top]))
+        return merged
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the scoring threads."""
+        with self._executor_lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=wait)
+            self._executor = None
+            self._executor_pid = None
+
+
+def _shard_top_k(score_range: Callable[[int, int], np.ndarray], start: int, stop: int, count: int,
+                 excluded: Optional[Sequence[np.ndarray]]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Score rows [start, stop) and keep the top count rows of each query, as global row ids."""
+    scores = score_range(start, stop)
+    results = []
+    for query, query_scores in enumerate(scores):
+        mask = None if excluded is None else excluded[query][start:stop]
+        top = top_k_rows(query_scores, count, mask)
+        results.append((start + top, query_scores[top]))
+    return results
@@ -1,14 +1,58 @@
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional, Union
+import numpy as np
+from scipy import sparse
 from data_manager import DataManager
+from instrumentation import span
+from lsh import LSHCandidateGenerator
+from parallel_scoring import ParallelScorer
 from similarity import SimilarityCalculator
+from similarity_engines import DEFAULT_ENGINE, JaccardEngine, SimilarityEngine
+from topk import top_k_rows
 
 class ContentRecommender:
-    def __init__(self, data_manager: DataManager, similarity_calculator: SimilarityCalculator):
-        """Initialize the content recommender with data manager and similarity calculator."""
+    def __init__(self, data_manager: DataManager, similarity_calculator: SimilarityCalculator,
+                 use_neighbor_table: bool = False,
+                 candidate_generator: Optional[LSHCandidateGenerator] = None,
+                 parallel_scorer: Optional[ParallelScorer] = None,
+                 engines: Optional[Dict[str, SimilarityEngine]] = None,
+                 default_engine: str = DEFAULT_ENGINE):
+        """
+        Initialize the content recommender with data manager and similarity calculator.
+
+        With use_neighbor_table enabled, requests are served from the catalog's
+        precomputed neighbor table when one is loaded and holds enough
+        neighbors; otherwise the catalog is scored live. A candidate generator
+        restricts live scoring to approximate candidates (e.g. from MinHash
+        LSH), which are then ranked by their exact score. A parallel scorer
+        splits full-catalog scans of large catalogs across cores.
+
+        engines are the similarity engines requests can pick by name
+        (defaults to Jaccard only), and default_engine the one used when a
+        request doesn't. Neighbor tables and LSH candidates approximate
+        Jaccard similarity, so they are only used by the Jaccard engine.
+        """
         self.data_manager = data_manager
         self.similarity_calculator = similarity_calculator
+        self.use_neighbor_table = use_neighbor_table
+        self.candidate_generator = candidate_generator
+        self.parallel_scorer = parallel_scorer
+        self.engines = engines if engines is not None else {JaccardEngine.name: JaccardEngine()}
+        self.default_engine = default_engine
 
-    def find_similar_content(self, title: str, number_of_recommendations: int = 5) -> List[Tuple[str, float]]:
+    def get_engine(self, name: Optional[str] = None) -> SimilarityEngine:
+        """Similarity engine by name; None returns the default engine."""
+        name = name or self.default_engine
+        engine = self.engines.get(name)
+        if engine is None:
+            raise ValueError(
+                f"Unknown similarity engine '{name}'. Use one of: {', '.join(self.engines)}."
+            )
+        return engine
+
+    def find_similar_content(self, title: str, number_of_recommendations: int = 5,
+                             content_type: Optional[str] = None,
+                             result_type: Optional[str] = None,
+                             engine: Optional[str] = None) -> List[Tuple[str, float]]:
         """
         Find similar content based on multiple features:
         - Description similarity
@@ -18,50 +62,94 @@ class ContentRecommender:
         Args:
             title: Title to find recommendations for
             number_of_recommendations: Number of recommendations to return
+            content_type: Catalog to search ('movies', 'shows' or 'all' for
+                both); defaults to the catalog selected by
+                DataManager.load_content()
+            result_type: Only recommend titles of this content type. A type
+                other than the searched catalog's scores the combined catalog,
+                e.g. shows similar to a movie
+            engine: Name of the similarity engine to score with; defaults to
+                the recommender's default engine
             
         Returns:
             List of (title, similarity_score) tuples
         """
-        def normalize_title(t):
-            # Convert to lowercase and remove punctuation
-            return ''.join(c.lower() for c in t if c.isalnum() or c.isspace()).strip()
-        
-        # Create case-insensitive and punctuation-insensitive mapping of titles
-        title_mapping = {normalize_title(t): t for t in self.data_manager.data['title'].values}
-        
-        # Check if title exists (case-insensitive and punctuation-insensitive)
-        normalized_search = normalize_title(title)
-        if normalized_search not in title_mapping:
-            raise ValueError(f"Title '{title}' not found in dataset")
+        # Hold one catalog snapshot for the whole call so a reload can't swap it mid-request
+        if result_type is not None and result_type not in self.data_manager.CONTENT_TYPES:
+            raise ValueError("Invalid result type. Use 'movies' or 'shows'.")
+        similarity_engine = self.get_engine(engine)
+        jaccard = isinstance(similarity_engine, JaccardEngine)
+        catalog = self.data_manager.get_catalog(content_type)
+        if result_type is not None and result_type != catalog.content_type:
+            catalog = self.data_manager.get_combined_catalog()
+        # Rows of other content types are masked out of a combined catalog's results
+        type_mask = None
+        if result_type is not None and catalog.content_types is not None:
+            type_mask = catalog.type_mask(result_type)
 
-        # Get the correctly formatted title
-        correct_title = title_mapping[normalized_search]
-        
-        # Get the reference movie data
-        title_mask = self.data_manager.data['title'] == correct_title
-        if not title_mask.any():
+        # Resolve the title ignoring case and punctuation
+        with span('title_lookup'):
+            reference_row = catalog.title_index.lookup(title)
+        if reference_row is None:
             raise ValueError(f"Title '{title}' not found in dataset")
-            
-        reference_movie = self.data_manager.data[title_mask].iloc[0].to_dict()
-        
-        # Calculate similarity with all other movies
-        similarities = []
-        for _, content in self.data_manager.data.iterrows():
-            if content['title'] != correct_title:  # Use correct_title for comparison
-                similarity = self.similarity_calculator.calculate_content_similarity(
-                    reference_movie,
-                    content.to_dict()
+        correct_title = catalog.title_index.title(reference_row)
+
+        titles = catalog.frame['title'].values
+        neighbor_table = catalog.neighbor_table
+        rows = None
+        if (self.use_neighbor_table and neighbor_table is not None
+                and jaccard and similarity_engine.weights is None
+                and number_of_recommendations <= neighbor_table.k):
+            # Serve from the offline table, rescoring the few neighbors exactly
+            # so scores and order match the live path
+            rows = neighbor_table.neighbors(reference_row, number_of_recommendations)
+        elif self.candidate_generator is not None and jaccard:
+            rows = self.candidate_generator.candidates(catalog, reference_row)
+            rows = rows[titles[rows] != correct_title]
+            if type_mask is not None:
+                rows = rows[type_mask[rows]]
+            # Too few approximate candidates to fill the request; scan everything
+            if len(rows) < number_of_recommendations:
+                rows = None
+
+        if rows is None and self.parallel_scorer is not None:
+            # Full scan in row shards across cores, merging each shard's top rows
+            excluded = catalog.title_index.exclusion_mask([correct_title])
+            if type_mask is not None:
+                excluded |= ~type_mask
+            with span('scoring'):
+                [(top_rows, top_scores)] = self.parallel_scorer.top_k(
+                    lambda start, stop: similarity_engine.similarity(
+                        catalog, reference_row, start, stop
+                    )[np.newaxis],
+                    len(titles), number_of_recommendations, [excluded]
                 )
-                similarities.append((content['title'], similarity))
-        
-        # Sort by similarity and return top N
-        sorted_similarities = sorted(similarities, key=lambda x: x[1], reverse=True)
-        
-        # Verify all recommended titles exist in the dataset
-        valid_recommendations = [
-            (t, s) for t, s in sorted_similarities[:number_of_recommendations]
-            if t in self.data_manager.data['title'].values
-        ]
+            valid_recommendations = [
+                (titles[row], float(score)) for row, score in zip(top_rows, top_scores)
+            ]
+            if not valid_recommendations:
+                raise ValueError("No valid recommendations found")
+            return valid_recommendations
+
+        with span('scoring'):
+            if rows is None:
+                # Score the reference row against the whole catalog in one vectorized pass,
+                # excluding every row with the reference title
+                rows = np.arange(len(titles))
+                similarities = similarity_engine.similarity(catalog, reference_row)
+                excluded = catalog.title_index.exclusion_mask([correct_title])
+                if type_mask is not None:
+                    excluded |= ~type_mask
+            else:
+                # Score only the candidate rows, then rank them exactly
+                similarities = similarity_engine.similarity_to_rows(catalog, reference_row, rows)
+                excluded = None
+
+        with span('ranking'):
+            valid_recommendations = [
+                (titles[rows[index]], float(similarities[index]))
+                for index in top_k_rows(similarities, number_of_recommendations, excluded)
+            ]
         
         if not valid_recommendations:
             raise ValueError("No valid recommendations found")
@@ -69,46 +157,187 @@ class ContentRecommender:
         return valid_recommendations
 
 
+    def find_similar_content_batch(self, titles: List[str], number_of_recommendations: int = 5,
+                                   content_type: Optional[str] = None,
+                                   rows_per_block: int = 256,
+                                   engine: Optional[str] = None,
+                                   result_type: Optional[str] = None) -> List[Union[List[Tuple[str, float]], ValueError]]:
+        """
+        Find similar content for many titles in one pass.
+
+        Query rows are scored in blocks as one sparse matrix-matrix product per
+        feature field instead of one catalog scan per title. Results match
+        find_similar_content with live scoring.
+
+        Args:
+            titles: Titles to find recommendations for
+            number_of_recommendations: Number of recommendations per title
+            content_type: Catalog to search; defaults to the loaded catalog
+            rows_per_block: Query titles scored per matrix product, bounding
+                memory to rows_per_block x catalog size scores
+            engine: Name of the similarity engine to score with; defaults to
+                the recommender's default engine
+            result_type: Only recommend titles of this content type, as in
+                find_similar_content
+
+        Returns:
+            One entry per input title, in order: its list of (title,
+            similarity_score) tuples, or the ValueError find_similar_content
+            would have raised for it
+        """
+        if result_type is not None and result_type not in self.data_manager.CONTENT_TYPES:
+            raise ValueError("Invalid result type. Use 'movies' or 'shows'.")
+        similarity_engine = self.get_engine(engine)
+        catalog = self.data_manager.get_catalog(content_type)
+        if result_type is not None and result_type != catalog.content_type:
+            catalog = self.data_manager.get_combined_catalog()
+        type_mask = None
+        if result_type is not None and catalog.content_types is not None:
+            type_mask = catalog.type_mask(result_type)
+        catalog_titles = catalog.frame['title'].values
+        results: List[Union[List[Tuple[str, float]], ValueError]] = []
+
+        for start in range(0, len(titles), rows_per_block):
+            block_titles = titles[start:start + rows_per_block]
+            with span('title_lookup'):
+                reference_rows = [catalog.title_index.lookup(title) for title in block_titles]
+            found_rows = [row for row in reference_rows if row is not None]
+            with span('scoring'):
+                scores = similarity_engine.similarity_block(catalog, found_rows) if found_rows else None
+
+            found = 0
+            with span('ranking'):
+                for title, reference_row in zip(block_titles, reference_rows):
+                    if reference_row is None:
+                        results.append(ValueError(f"Title '{title}' not found in dataset"))
+                        continue
+                    similarities = scores[found]
+                    found += 1
+
+                    excluded = catalog.title_index.exclusion_mask([catalog_titles[reference_row]])
+                    if type_mask is not None:
+                        excluded |= ~type_mask
+                    recommendations = [
+                        (catalog_titles[row], float(similarities[row]))
+                        for row in top_k_rows(similarities, number_of_recommendations, excluded)
+                    ]
+                    results.append(
+                        recommendations or ValueError("No valid recommendations found")
+                    )
+
+        return results
+
 class UserBasedRecommender:
-    def __init__(self, data_manager: DataManager, similarity_calculator: SimilarityCalculator):
-        """Initialize the user-based recommender."""
+    def __init__(self, data_manager: DataManager, similarity_calculator: SimilarityCalculator,
+                 parallel_scorer: Optional[ParallelScorer] = None):
+        """
+        Initialize the user-based recommender.
+
+        A parallel scorer splits the scoring of large catalogs across cores.
+        """
         self.data_manager = data_manager
         self.similarity_calculator = similarity_calculator
+        self.parallel_scorer = parallel_scorer
 
-    def recommend_from_ratings(self, user_ratings: Dict[str, float], number_of_recommendations: int) -> List[Tuple[str, float]]:
+    def recommend_from_ratings(self, user_ratings: Dict[str, float], number_of_recommendations: int,
+                               content_type: Optional[str] = None) -> List[Tuple[str, float]]:
         """
         Recommend content based on user ratings.
         
         Args:
             user_ratings: Dictionary mapping title to rating (1-5)
             number_of_recommendations: Number of recommendations to return
+            content_type: Catalog to search; defaults to the loaded catalog
             
         Returns:
             List of (title, score) tuples
         """
-        if not user_ratings:
-            return []
-            
-        recommendations = []
+        return self.recommend_from_ratings_batch(
+            [user_ratings], number_of_recommendations, content_type
+        )[0]
+
+    def recommend_from_ratings_batch(self, users_ratings: List[Dict[str, float]],
+                                     number_of_recommendations: int,
+                                     content_type: Optional[str] = None,
+                                     users_per_chunk: int = 256) -> List[List[Tuple[str, float]]]:
+        """
+        Recommend content for many users in one pass.
+
+        A user's score for every candidate is their rating vector (each rating
+        normalized with rating / 5.0) times the similarity block between the
+        titles they rated and the whole catalog. Users are processed in chunks
+        as a sparse (users x rated titles) weight matrix times the dense
+        (rated titles x catalog) similarity block, so memory stays bounded.
         
-        # For each unrated movie, calculate a weighted similarity score
-        for _, content in self.data_manager.data.iterrows():
-            title = content['title']
-            if title in user_ratings:
+        Args:
+            users_ratings: One dictionary mapping title to rating (1-5) per user
+            number_of_recommendations: Number of recommendations per user
+            content_type: Catalog to search; defaults to the loaded catalog
+            users_per_chunk: Number of users scored per matrix product
+            
+        Returns:
+            One list of (title, score) tuples per user, in input order
+        """
+        catalog = self.data_manager.get_catalog(content_type)
+        titles = catalog.frame['title']
+        results = []
+
+        for start in range(0, len(users_ratings), users_per_chunk):
+            chunk = users_ratings[start:start + users_per_chunk]
+
+            # Rated rows shared across the chunk are scored once
+            block_rows: Dict[int, int] = {}
+            indptr = [0]
+            indices = []
+            weights = []
+            for user_ratings in chunk:
+                for rated_title, rating in user_ratings.items():
+                    row = catalog.title_index.row(rated_title)
+                    if row is None:
+                        raise ValueError(f"Title '{rated_title}' not found in dataset")
+                    indices.append(block_rows.setdefault(row, len(block_rows)))
+                    weights.append(rating / 5.0)  # Normalize rating to 0-1 range
+                indptr.append(len(indices))
+
+            if not block_rows:
+                results.extend([] for _ in chunk)
+                continue
+
+            # Column order within each user's row follows their ratings, so the
+            # product accumulates each score in the same order as a Python loop would
+            user_weights = sparse.csr_matrix(
+                (weights, indices, indptr), shape=(len(chunk), len(block_rows))
+            )
+            if self.parallel_scorer is not None:
+                # Score catalog row shards across cores, merging each shard's top rows
+                excluded = [catalog.title_index.exclusion_mask(user_ratings) for user_ratings in chunk]
+                with span('scoring'):
+                    top = self.parallel_scorer.top_k(
+                        lambda start, stop: user_weights.dot(
+                            catalog.feature_index.similarity_block(list(block_rows), start, stop)
+                        ),
+                        len(catalog), number_of_recommendations, excluded
+                    )
+                for user_ratings, (top_rows, top_scores) in zip(chunk, top):
+                    results.append([
+                        (titles.iat[row], float(score)) for row, score in zip(top_rows, top_scores)
+                    ] if user_ratings else [])
                 continue
-                
-            total_score = 0.0
-            for rated_title, rating in user_ratings.items():
-                rated_movie = self.data_manager.data[
-                    self.data_manager.data['title'] == rated_title].iloc[0].to_dict()
-                
-                similarity = self.similarity_calculator.calculate_content_similarity(
-                    rated_movie,
-                    content.to_dict()
+
+            with span('scoring'):
+                scores = user_weights.dot(
+                    catalog.feature_index.similarity_block(list(block_rows))
                 )
-                total_score += similarity * (rating / 5.0)  # Normalize rating to 0-1 range
-            
-            recommendations.append((title, total_score))
-        
-        # Sort by score and return top N
-        return sorted(recommendations, key=lambda x: x[1], reverse=True)[:number_of_recommendations]
+
+            with span('ranking'):
+                for user, user_ratings in enumerate(chunk):
+                    if not user_ratings:
+                        results.append([])
+                        continue
+                    rated = catalog.title_index.exclusion_mask(user_ratings)
+                    top_rows = top_k_rows(scores[user], number_of_recommendations, rated)
+                    results.append([
+                        (titles.iat[row], float(scores[user, row])) for row in top_rows
+                    ])
+
+        return results
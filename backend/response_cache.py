@@ -0,0 +1,239 @@
+"""
+In-process cache of /recommend results.
+
+Traffic is skewed toward popular titles, so the same (title, count) pairs are
+scored over and over. Results are cached per (catalog version, content type,
+normalized title); each entry remembers how many recommendations it was
+computed for, so a request for count=5 is served from a cached count=10 result
+by taking its first five items (rankings are deterministic, so a top-5 is
+always the prefix of the top-10).
+
+Storage is pluggable through CacheBackend: LRUCacheBackend keeps entries in
+process memory, SQLiteCacheBackend keeps them in a file that every worker
+process on the machine can share.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+
+class CacheBackend:
+    """Key-value storage used by RecommendationCache."""
+
+    def __init__(self):
+        self.evictions = 0
+        self._evictions_lock = threading.Lock()
+
+    def _count_evictions(self, count: int = 1) -> None:
+        with self._evictions_lock:
+            self.evictions += count
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Value stored for a key, or None if absent or expired."""
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting older entries if the backend is full."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class LRUCacheBackend(CacheBackend):
+    """Bounded in-memory LRU store with an optional time-to-live."""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            ttl: Seconds an entry stays valid; None keeps entries until evicted
+        """
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self._count_evictions()
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._count_evictions()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    LRU store in a SQLite file shared by every process on the machine.
+
+    A local stand-in for a shared cache service: workers of a pre-fork server
+    see each other's entries. Connections are opened per thread and process.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: Optional[float] = None):
+        """
+        Args:
+            path: Database file
+            max_entries: Entries kept before the least recently used are evicted
+            ttl: Seconds an entry stays valid; None keeps entries until evicted
+        """
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB, expires REAL, last_used REAL)'
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection owned by the current thread in the current process."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _encode_key(key: Hashable) -> str:
+        return json.dumps(key)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (self._encode_key(key),)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires = row
+            if expires is not None and expires < now:
+                connection.execute('DELETE FROM cache WHERE key = ?', (self._encode_key(key),))
+                self._count_evictions()
+                return None
+            connection.execute(
+                'UPDATE cache SET last_used = ? WHERE key = ?', (now, self._encode_key(key))
+            )
+        return pickle.loads(value)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        now = time.time()
+        expires = now + self.ttl if self.ttl is not None else None
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, last_used) VALUES (?, ?, ?, ?)',
+                (self._encode_key(key), pickle.dumps(value), expires, now)
+            )
+            evicted = connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            ).rowcount
+            if evicted > 0:
+                self._count_evictions(evicted)
+
+    def clear(self) -> None:
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def __len__(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+
+class RecommendationCache:
+    """Caches recommendation lists and serves smaller counts from larger cached results."""
+
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        """Initialize the cache on a backend; defaults to an in-memory LRU."""
+        self.backend = backend if backend is not None else LRUCacheBackend()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'RecommendationCache':
+        """Build a cache from the RECOMMENDER_CACHE_* environment variables."""
+        size = int(os.environ.get('RECOMMENDER_CACHE_SIZE', '1024'))
+        ttl = os.environ.get('RECOMMENDER_CACHE_TTL')
+        ttl = float(ttl) if ttl else None
+        if os.environ.get('RECOMMENDER_CACHE_BACKEND', 'memory') == 'sqlite':
+            path = os.environ.get('RECOMMENDER_CACHE_PATH', 'recommendation_cache.sqlite3')
+            return cls(SQLiteCacheBackend(path, size, ttl))
+        return cls(LRUCacheBackend(size, ttl))
+
+    def get(self, catalog_version: str, content_type: str, normalized_title: str,
+            count: int) -> Optional[List[Tuple[str, float]]]:
+        """
+        Cached recommendations for a request, or None on a miss.
+
+        An entry computed for a larger count serves any smaller count. An entry
+        that came back shorter than its count has every candidate already and
+        serves any count. Counts below 1 always miss.
+        """
+        entry = self.backend.get((catalog_version, content_type, normalized_title)) if count >= 1 else None
+        hit = entry is not None and (entry[0] >= count or len(entry[1]) < entry[0])
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry[1][:count] if hit else None
+
+    def put(self, catalog_version: str, content_type: str, normalized_title: str,
+            count: int, recommendations: List[Tuple[str, float]]) -> None:
+        """Store recommendations computed for a count, unless a larger result is cached."""
+        if count < 1:
+            return
+        key = (catalog_version, content_type, normalized_title)
+        entry = self.backend.get(key)
+        if entry is None or entry[0] < count:
+            self.backend.set(key, (count, list(recommendations)))
+
+    def invalidate(self, *_) -> None:
+        """Drop every entry; registered as a DataManager reload listener."""
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit, miss and eviction counters plus the current entry count."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'entries': len(self.backend),
+        }
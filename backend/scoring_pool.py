@@ -0,0 +1,122 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+import contextvars
+import multiprocessing
+import os
+import threading
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when the scoring pool already has its maximum number of pending jobs."""
+
+
+class ScoringPool:
+    """
+    Bounded pool that runs CPU-heavy scoring off the request threads.
+
+    At most max_pending jobs may be queued or running at once, including jobs
+    whose caller timed out but which are still running; further jobs are
+    rejected with PoolSaturatedError instead of piling up, so a burst of
+    expensive requests can't starve the threads handling I/O.
+
+    The underlying executor is created lazily in the process that first uses
+    it, so a pool configured before a pre-fork server forks its workers gives
+    every worker its own executor.
+    """
+
+    def __init__(self, kind: str = 'thread', max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            kind: 'thread' (NumPy/SciPy release the GIL in the scoring kernels)
+                or 'process' (forked workers inherit the loaded catalogs)
+            max_workers: Number of worker threads or processes; defaults to the CPU count
+            max_pending: Jobs allowed in flight at once; defaults to 4 x max_workers
+            timeout: Seconds to wait for a job's result before giving up
+        """
+        if kind not in ('thread', 'process'):
+            raise ValueError("Invalid pool kind. Use 'thread' or 'process'.")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor: Optional[Executor] = None
+        self._executor_pid: Optional[int] = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ScoringPool':
+        """Build a pool from the RECOMMENDER_SCORING_* environment variables."""
+        def optional_number(name, convert):
+            value = os.environ.get(name)
+            return convert(value) if value else None
+
+        return cls(
+            kind=os.environ.get('RECOMMENDER_SCORING_POOL', 'thread'),
+            max_workers=optional_number('RECOMMENDER_SCORING_WORKERS', int),
+            max_pending=optional_number('RECOMMENDER_SCORING_MAX_PENDING', int),
+            timeout=optional_number('RECOMMENDER_SCORING_TIMEOUT', float),
+        )
+
+    def _get_executor(self) -> Executor:
+        """Executor owned by the current process, created on first use."""
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                if self.kind == 'thread':
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='scoring'
+                    )
+                else:
+                    # Fork so workers share the already loaded catalogs copy-on-write
+                    methods = multiprocessing.get_all_start_methods()
+                    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers, mp_context=context
+                    )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def run(self, function: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a function on the pool and wait for its result.
+
+        With a process pool the function and arguments must be picklable, so
+        pass a module-level function rather than a bound method.
+
+        Raises:
+            PoolSaturatedError: If max_pending jobs are already in flight
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturatedError('Too many scoring requests in flight')
+        try:
+            executor = self._get_executor()
+            if self.kind == 'thread':
+                # Run in a copy of the caller's context so per-request state
+                # (such as an active profile) follows the job onto the pool thread
+                future = executor.submit(contextvars.copy_context().run, function, *args, **kwargs)
+            else:
+                future = executor.submit(function, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the job itself finishes, not until the caller
+        # stops waiting, so jobs that outlive their timeout still count
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Drop the job if it hasn't started; a running job can't be stopped
+            future.cancel()
+            raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and, if wait is set, let running jobs finish."""
+        with self._executor_lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=wait)
+            self._executor = None
+            self._executor_pid = None
@@ -0,0 +1,139 @@
+"""
+Production server for the recommendation API.
+
+    python backend/server.py --workers 4 --threads 8 --scoring-workers 2
+
+The /recommend contract is the same as the development server (python app.py).
+
+With gunicorn installed (Linux/macOS), the app is loaded once in the master
+process before workers are forked (preload), so the catalogs, feature matrices
+and neighbor tables are shared copy-on-write between workers instead of being
+loaded per worker; arrays from the binary catalog cache are memory-mapped and
+shared through the page cache as well. Each worker handles requests on a pool
+of threads and runs scoring on its own bounded scoring pool. SIGTERM stops the
+workers gracefully: in-flight requests get --graceful-timeout seconds to finish.
+
+Without gunicorn (e.g. on Windows) it falls back to a single-process threaded
+server with the same scoring pool. On SIGTERM/SIGINT it stops accepting
+connections and drains in-flight requests the same way, waiting up to
+--graceful-timeout seconds before exiting.
+"""
+import argparse
+import gc
+import os
+import signal
+import threading
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn doesn't support Windows
+    BaseApplication = None
+
+
+def _load_app():
+    """Import the Flask app, which loads both catalogs."""
+    import app as app_module
+    return app_module
+
+
+def _shutdown_scoring_pool() -> None:
+    """Let running scoring jobs finish before the process exits."""
+    _load_app().scoring_pool.shutdown(wait=True)
+
+
+def _worker_exit(server, worker) -> None:
+    """Gunicorn hook run as each worker exits."""
+    _shutdown_scoring_pool()
+
+
+if BaseApplication is not None:
+    class RecommenderApplication(BaseApplication):
+        """Gunicorn application that preloads the catalogs before forking workers."""
+
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            app_module = _load_app()
+            # Move everything loaded so far out of the garbage collector's view,
+            # so collections in the workers don't touch (and copy) shared pages
+            gc.freeze()
+            return app_module.app
+
+
+def _serve_threaded(host: str, port: int, graceful_timeout: float) -> None:
+    """Single-process threaded fallback when gunicorn isn't available."""
+    from werkzeug.serving import make_server
+
+    app_module = _load_app()
+    server = make_server(host, port, app_module.app, threaded=True)
+    # Keep track of request threads so closing the server waits for them
+    server.daemon_threads = False
+    server.block_on_close = True
+
+    def stop(*_):
+        # Requests still running after the grace period are abandoned
+        deadline = threading.Timer(graceful_timeout, os._exit, (1,))
+        deadline.daemon = True
+        deadline.start()
+        # shutdown() blocks until serve_forever() returns, so call it off the main thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f'Serving on http://{host}:{port}')
+    # Returns once stopped, after server_close() has joined the request threads
+    server.serve_forever()
+    _shutdown_scoring_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the recommendation API in production mode.')
+    parser.add_argument('--host', default='0.0.0.0', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=5000, help='Port to bind')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (gunicorn only)')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='Request threads per worker (gunicorn only)')
+    parser.add_argument('--scoring-pool', choices=['thread', 'process'], default='thread',
+                        help='Run scoring on threads or forked processes')
+    parser.add_argument('--scoring-workers', type=int, default=2,
+                        help='Scoring threads or processes per worker')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='Scoring jobs allowed in flight per worker before answering 503')
+    parser.add_argument('--scoring-timeout', type=float, default=None,
+                        help='Seconds a request waits for scoring before answering 504')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='Seconds in-flight requests get to finish on shutdown')
+    args = parser.parse_args()
+
+    # Read by ScoringPool.from_env() when the app module is imported
+    os.environ['RECOMMENDER_SCORING_POOL'] = args.scoring_pool
+    os.environ['RECOMMENDER_SCORING_WORKERS'] = str(args.scoring_workers)
+    if args.max_pending is not None:
+        os.environ['RECOMMENDER_SCORING_MAX_PENDING'] = str(args.max_pending)
+    if args.scoring_timeout is not None:
+        os.environ['RECOMMENDER_SCORING_TIMEOUT'] = str(args.scoring_timeout)
+
+    if BaseApplication is None:
+        _serve_threaded(args.host, args.port, args.graceful_timeout)
+        return
+
+    RecommenderApplication({
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'graceful_timeout': args.graceful_timeout,
+        'worker_exit': _worker_exit,
+    }).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,62 @@
-from typing import List, Tuple, Set, Dict
+from typing import TYPE_CHECKING, List, Optional, Tuple, Set, Dict, FrozenSet, Union
+import functools
+import re
+import numpy as np
+
+if TYPE_CHECKING:
+    from feature_index import FeatureIndex
+
+# Anything that is neither alphanumeric nor whitespace; \w also matches '_',
+# so it is removed explicitly (same result as filtering with str.isalnum/isspace)
+_SPECIAL_CHARACTERS = re.compile(r'[^\w\s]|_')
+
+# Ad-hoc texts whose tokens are memoized; catalog fields are tokenized once by
+# FeatureIndex and never go through the memo
+PREPROCESS_CACHE_SIZE = 1024
+
 
 class SimilarityCalculator:
+    # Feature fields and their weights in the combined content similarity
+    FEATURE_WEIGHTS = {
+        'description': 0.5,
+        'listed_in': 0.3,
+        'title': 0.2,
+    }
+
+    # Common words removed during preprocessing
+    STOP_WORDS = frozenset({
+        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'
+    })
+
     @staticmethod
-    def preprocess_text(text: str) -> Set[str]:
+    def _tokenize(text: str) -> FrozenSet[str]:
         """
         Clean and preprocess text by:
         1. Converting to lowercase
         2. Removing special characters
         3. Removing common words
         4. Splitting into words
+
+        Not memoized; FeatureIndex tokenizes every catalog field through this
+        exactly once.
         """
-        # Common words to remove
-        common_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        
         # Convert to lowercase and remove special characters
-        text = text.lower()
-        text = ''.join(c for c in text if c.isalnum() or c.isspace())
-        
+        text = _SPECIAL_CHARACTERS.sub('', text.lower())
+
         # Split into words and remove common words
-        words = set(text.split())
-        return words - common_words
+        return frozenset(text.split()) - SimilarityCalculator.STOP_WORDS
+
+    @staticmethod
+    @functools.lru_cache(maxsize=PREPROCESS_CACHE_SIZE)
+    def preprocess_text(text: str) -> FrozenSet[str]:
+        """
+        Tokens of ad-hoc text, as _tokenize returns them.
+
+        Results of the most recent texts are memoized, so comparing the same
+        item against many others tokenizes each of its fields once. The
+        returned set is immutable because it is shared between callers.
+        """
+        return SimilarityCalculator._tokenize(text)
 
     @staticmethod
     def calculate_jaccard_similarity(first_set: Set[str], second_set: Set[str]) -> float:
@@ -35,34 +72,39 @@ class SimilarityCalculator:
         
         return intersection / union if union > 0 else 0.0
 
-    def calculate_content_similarity(self, first_movie: Dict[str, str], second_movie: Dict[str, str]) -> float:
+    @staticmethod
+    def calculate_id_jaccard_similarity(first_ids: np.ndarray, second_ids: np.ndarray) -> float:
+        """Jaccard similarity of two sorted arrays of distinct token ids."""
+        if not len(first_ids) or not len(second_ids):
+            return 0.0
+
+        intersection = len(np.intersect1d(first_ids, second_ids, assume_unique=True))
+        return intersection / (len(first_ids) + len(second_ids) - intersection)
+
+    def calculate_content_similarity(self, first_movie: Union[Dict[str, str], int],
+                                     second_movie: Union[Dict[str, str], int],
+                                     feature_index: Optional['FeatureIndex'] = None) -> float:
         """
         Calculate similarity between two movies using multiple features:
         1. Description similarity (50% weight)
         2. Genre similarity (30% weight)
         3. Title word similarity (20% weight)
+
+        With a feature index, both movies are its row numbers and each field's
+        similarity intersects the sorted token ids stored in the index;
+        otherwise they are dictionaries of field text, tokenized here.
         """
-        # Calculate description similarity
-        description_similarity = self.calculate_jaccard_similarity(
-            self.preprocess_text(first_movie.get('description', '')),
-            self.preprocess_text(second_movie.get('description', ''))
-        )
-        
-        # Calculate genre similarity
-        genre_similarity = self.calculate_jaccard_similarity(
-            self.preprocess_text(first_movie.get('listed_in', '')),
-            self.preprocess_text(second_movie.get('listed_in', ''))
-        )
-        
-        # Calculate title word similarity
-        title_similarity = self.calculate_jaccard_similarity(
-            self.preprocess_text(first_movie.get('title', '')),
-            self.preprocess_text(second_movie.get('title', ''))
-        )
-        
-        # Weighted average of similarities
-        return (
-            0.5 * description_similarity +
-            0.3 * genre_similarity +
-            0.2 * title_similarity
-        )
+        # Weighted sum of the per-feature Jaccard similarities
+        similarity = 0.0
+        for field, weight in self.FEATURE_WEIGHTS.items():
+            if feature_index is not None:
+                similarity += weight * self.calculate_id_jaccard_similarity(
+                    feature_index.token_ids(field, first_movie),
+                    feature_index.token_ids(field, second_movie)
+                )
+            else:
+                similarity += weight * self.calculate_jaccard_similarity(
+                    self.preprocess_text(first_movie.get(field, '')),
+                    self.preprocess_text(second_movie.get(field, ''))
+                )
+        return similarity
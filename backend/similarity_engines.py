@@ -0,0 +1,214 @@
+"""
+Similarity engines: interchangeable ways to score catalog rows against each other.
+
+- JaccardEngine is the original content similarity: the weighted Jaccard
+  similarity of each feature field's token sets, read from the catalog's
+  FeatureIndex.
+- TfidfCosineEngine weights each token by its inverse document frequency
+  within the field and scores rows by the weighted cosine similarity of
+  those TF-IDF vectors, so rare shared words count for more than common
+  ones. Each field's vectors are L2-normalized and scaled by the square
+  root of the field weight, then stacked side by side into one sparse
+  matrix per catalog. The weighted sum of per-field cosines is then a
+  single sparse dot product.
+
+Both read the token matrices FeatureIndex has already built, so no engine
+re-tokenizes. TfidfCosineEngine needs scikit-learn.
+
+The engine is chosen per request by name (see available_engines()); the
+default comes from RECOMMENDER_SIMILARITY_ENGINE.
+"""
+from typing import Dict, Optional, Sequence, Tuple
+import os
+import threading
+import numpy as np
+from scipy import sparse
+from catalog import Catalog
+from feature_index import csr_row_range
+from instrumentation import span
+
+try:
+    from sklearn.feature_extraction.text import TfidfTransformer
+except ImportError:  # scikit-learn is only needed by TfidfCosineEngine
+    TfidfTransformer = None
+
+DEFAULT_ENGINE = 'jaccard'
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """Parse field weights written as 'description=0.6,listed_in=0.2,title=0.2'."""
+    weights = {}
+    for item in value.split(','):
+        field, _, weight = item.partition('=')
+        weights[field.strip()] = float(weight)
+    return weights
+
+
+class SimilarityEngine:
+    """
+    Scores catalog rows against each other.
+
+    Every method returns a similarity in [0, 1] per scored row, higher is
+    more similar; start and stop limit scoring to a range of rows, e.g. one
+    shard of a parallel scan.
+    """
+
+    # Name requests select the engine by
+    name = ''
+
+    def similarity(self, catalog: Catalog, row: int, start: int = 0,
+                   stop: Optional[int] = None) -> np.ndarray:
+        """Similarity of one row against rows [start, stop)."""
+        raise NotImplementedError
+
+    def similarity_to_rows(self, catalog: Catalog, row: int, rows: Sequence[int]) -> np.ndarray:
+        """Similarity of one row against selected rows only."""
+        raise NotImplementedError
+
+    def similarity_block(self, catalog: Catalog, rows: Sequence[int], start: int = 0,
+                         stop: Optional[int] = None) -> np.ndarray:
+        """len(rows) x (stop - start) similarities of several rows against rows [start, stop)."""
+        raise NotImplementedError
+
+
+class JaccardEngine(SimilarityEngine):
+    """Weighted Jaccard similarity of token sets, as computed by FeatureIndex."""
+
+    name = 'jaccard'
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            weights: Weight per feature field; defaults to the weights the
+                catalog's feature index was built with
+        """
+        self.weights = weights
+
+    def _field_weights(self, catalog: Catalog) -> Optional[Dict[str, float]]:
+        """Custom weights, or None when the feature index's own weights apply."""
+        if self.weights is None or self.weights == catalog.feature_index.weights:
+            return None
+        return self.weights
+
+    def similarity(self, catalog: Catalog, row: int, start: int = 0,
+                   stop: Optional[int] = None) -> np.ndarray:
+        feature_index = catalog.feature_index
+        weights = self._field_weights(catalog)
+        if weights is None:
+            return feature_index.similarity(row, start, stop)
+        stop = len(feature_index) if stop is None else stop
+        scores = np.zeros(stop - start)
+        for field, weight in weights.items():
+            scores += weight * feature_index.jaccard_similarity(field, row, start, stop)
+        return scores
+
+    def similarity_to_rows(self, catalog: Catalog, row: int, rows: Sequence[int]) -> np.ndarray:
+        feature_index = catalog.feature_index
+        weights = self._field_weights(catalog)
+        if weights is None:
+            return feature_index.similarity_to_rows(row, rows)
+        scores = np.zeros(len(rows))
+        for field, weight in weights.items():
+            scores += weight * feature_index.jaccard_similarity_to_rows(field, row, rows)
+        return scores
+
+    def similarity_block(self, catalog: Catalog, rows: Sequence[int], start: int = 0,
+                         stop: Optional[int] = None) -> np.ndarray:
+        feature_index = catalog.feature_index
+        weights = self._field_weights(catalog)
+        if weights is None:
+            return feature_index.similarity_block(rows, start, stop)
+        stop = len(feature_index) if stop is None else stop
+        scores = np.zeros((len(rows), stop - start))
+        for field, weight in weights.items():
+            scores += weight * feature_index.jaccard_similarity_block(field, rows, start, stop)
+        return scores
+
+
+class TfidfCosineEngine(SimilarityEngine):
+    """Weighted cosine similarity of per-field TF-IDF vectors, one sparse dot product per query."""
+
+    name = 'tfidf'
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize the engine.
+
+        Args:
+            weights: Weight per feature field; defaults to the weights the
+                catalog's feature index was built with. Weights summing to 1
+                keep scores in [0, 1]
+        """
+        if TfidfTransformer is None:
+            raise ImportError('TfidfCosineEngine needs scikit-learn (pip install scikit-learn).')
+        self.weights = weights
+        # Content type -> (catalog version, stacked TF-IDF matrix) of the latest catalog seen
+        self._matrices: Dict[str, Tuple[str, sparse.csr_matrix]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'TfidfCosineEngine':
+        """Build an engine with weights from RECOMMENDER_TFIDF_WEIGHTS, if set."""
+        weights = os.environ.get('RECOMMENDER_TFIDF_WEIGHTS')
+        return cls(parse_weights(weights) if weights else None)
+
+    def matrix(self, catalog: Catalog) -> sparse.csr_matrix:
+        """
+        The catalog's stacked TF-IDF matrix, built on first use per catalog version.
+
+        Token sets are binary, so term frequency is 1 for every token a field
+        contains; IDF uses scikit-learn's smoothed formula.
+        """
+        cached = self._matrices.get(catalog.content_type)
+        if cached is not None and cached[0] == catalog.version:
+            return cached[1]
+
+        with self._lock:
+            cached = self._matrices.get(catalog.content_type)
+            if cached is None or cached[0] != catalog.version:
+                feature_index = catalog.feature_index
+                weights = self.weights or feature_index.weights
+                with span('tfidf_build'):
+                    blocks = []
+                    for field, weight in weights.items():
+                        vectors = TfidfTransformer(norm='l2').fit_transform(
+                            feature_index.matrices[field].astype(np.float64)
+                        )
+                        blocks.append(vectors * np.sqrt(weight))
+                    cached = (catalog.version, sparse.hstack(blocks, format='csr'))
+                self._matrices[catalog.content_type] = cached
+        return cached[1]
+
+    def similarity(self, catalog: Catalog, row: int, start: int = 0,
+                   stop: Optional[int] = None) -> np.ndarray:
+        matrix = self.matrix(catalog)
+        stop = matrix.shape[0] if stop is None else stop
+        query = matrix[row].toarray().ravel()
+        return csr_row_range(matrix, start, stop).dot(query)
+
+    def similarity_to_rows(self, catalog: Catalog, row: int, rows: Sequence[int]) -> np.ndarray:
+        matrix = self.matrix(catalog)
+        query = matrix[row].toarray().ravel()
+        return matrix[np.asarray(rows, dtype=np.intp)].dot(query)
+
+    def similarity_block(self, catalog: Catalog, rows: Sequence[int], start: int = 0,
+                         stop: Optional[int] = None) -> np.ndarray:
+        matrix = self.matrix(catalog)
+        stop = matrix.shape[0] if stop is None else stop
+        queries = matrix[np.asarray(rows, dtype=np.intp)]
+        return queries.dot(csr_row_range(matrix, start, stop).T).toarray()
+
+
+def available_engines() -> Dict[str, SimilarityEngine]:
+    """Every engine that can run here, by name; TF-IDF is left out without scikit-learn."""
+    engines: Dict[str, SimilarityEngine] = {JaccardEngine.name: JaccardEngine()}
+    if TfidfTransformer is not None:
+        engines[TfidfCosineEngine.name] = TfidfCosineEngine.from_env()
+    return engines
+
+
+def default_engine_name() -> str:
+    """Engine used when a request doesn't pick one, from RECOMMENDER_SIMILARITY_ENGINE."""
+    return os.environ.get('RECOMMENDER_SIMILARITY_ENGINE', DEFAULT_ENGINE)
@@ -0,0 +1,29 @@
+import os
+import sys
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Backend modules import each other by their flat names
+sys.path.insert(0, BACKEND_DIR)
+
+from data_manager import DataManager  # noqa: E402
+
+MOVIES_PATH = os.path.join(BACKEND_DIR, 'movies.csv')
+SHOWS_PATH = os.path.join(BACKEND_DIR, 'tv_shows.csv')
+
+
+@pytest.fixture(scope='session')
+def data_manager():
+    """DataManager over the bundled CSVs, built without the on-disk cache."""
+    return DataManager(movies_path=MOVIES_PATH, shows_path=SHOWS_PATH, use_cache=False)
+
+
+@pytest.fixture
+def write_catalog(tmp_path):
+    """Write rows to catalog CSVs and return a DataManager over them (same frame for both types)."""
+    def write(rows, **options):
+        import pandas as pd
+        path = str(tmp_path / 'catalog.csv')
+        pd.DataFrame(rows).to_csv(path, index=False)
+        return DataManager(movies_path=path, shows_path=path, use_cache=False, **options)
+    return write
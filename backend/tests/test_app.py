@@ -0,0 +1,176 @@
+import pytest
+from response_cache import RecommendationCache
+
+
+@pytest.fixture(scope='module')
+def client():
+    import app
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('count', [0, -3, 2.5, '5', True, None])
+def test_recommend_rejects_counts_that_are_not_positive_ints(client, count):
+    response = client.post('/recommend', json={'title': 'Dick Johnson Is Dead', 'count': count})
+    assert response.status_code == 400
+    assert 'count' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('count', [0, -1, 1.0, False])
+def test_batch_rejects_counts_that_are_not_positive_ints(client, count):
+    response = client.post('/recommend/batch', json={'titles': ['Dick Johnson Is Dead'], 'count': count})
+    assert response.status_code == 400
+    assert 'count' in response.get_json()['error']
+
+
+def test_recommend_serves_a_valid_count(client):
+    response = client.post('/recommend', json={'title': 'Dick Johnson Is Dead', 'count': 3})
+    assert response.status_code == 200
+    assert len(response.get_json()['recommendations']) == 3
+
+
+def test_cache_treats_counts_below_one_as_misses():
+    cache = RecommendationCache()
+    recommendations = [('A', 0.9), ('B', 0.5)]
+    cache.put('v1', 'movies', 'x', 0, [])
+    assert len(cache.backend) == 0
+
+    cache.put('v1', 'movies', 'x', 2, recommendations)
+    assert cache.get('v1', 'movies', 'x', 0) is None
+    assert cache.get('v1', 'movies', 'x', -1) is None
+    assert cache.get('v1', 'movies', 'x', 1) == recommendations[:1]
+    assert cache.stats()['misses'] == 2
+
+
+def test_recommend_rejects_an_unknown_engine(client):
+    response = client.post('/recommend', json={'title': 'Dick Johnson Is Dead', 'engine': 'bm25'})
+    assert response.status_code == 400
+    assert 'Unknown similarity engine' in response.get_json()['error']
+
+
+def test_each_engine_gets_its_own_cache_entry(client):
+    import app
+    request = {'title': 'Dick Johnson Is Dead', 'count': 10}
+    results = {}
+    app.recommendation_cache.invalidate()
+    hits = app.recommendation_cache.hits
+    for engine in ('jaccard', 'tfidf', 'jaccard', 'tfidf'):
+        response = client.post('/recommend', json={**request, 'engine': engine})
+        assert response.status_code == 200
+        titles = [item['title'] for item in response.get_json()['recommendations']]
+        assert results.setdefault(engine, titles) == titles
+    # The repeats are served from cache, each from its own engine's entry
+    assert app.recommendation_cache.hits == hits + 2
+    assert results['jaccard'] != results['tfidf']
+    for engine, titles in results.items():
+        expected = app.recommender.find_similar_content(request['title'], 10, 'movies', engine=engine)
+        assert titles == [title for title, _ in expected]
+
+
+def search(client, query, **params):
+    response = client.get('/search', query_string={'q': query, **params})
+    assert response.status_code == 200
+    return response.get_json()['results']
+
+
+def test_search_lists_prefix_matches_first(client):
+    results = search(client, 'dick joh')
+    assert results[0] == {'title': 'Dick Johnson Is Dead', 'content_type': 'movies'}
+    # A later word of the title matches too
+    assert search(client, 'johnson is')[0]['title'] == 'Dick Johnson Is Dead'
+    assert len(search(client, 'the', limit=3)) == 3
+
+
+def test_search_tolerates_typos_and_filters_by_content_type(client):
+    assert search(client, 'Dik Jonson Is Ded')[0]['title'] == 'Dick Johnson Is Dead'
+    results = search(client, 'blood wate', content_type='shows')
+    assert results[0] == {'title': 'Blood & Water', 'content_type': 'shows'}
+    assert all(result['content_type'] == 'shows' for result in results)
+    assert client.get('/search', query_string={'q': ' '}).status_code == 400
+
+
+def test_missing_title_gets_did_you_mean_suggestions(client):
+    response = client.post('/recommend', json={'title': 'Dik Jonson Is Ded'})
+    assert response.status_code == 404
+    body = response.get_json()
+    assert body['available_titles'][0] == 'Dick Johnson Is Dead'
+    assert 'Did you mean "Dick Johnson Is Dead"?' in body['error']
+
+
+def test_title_in_the_other_catalog_falls_back_to_it(client):
+    # A show asked for as a movie still gets movie recommendations
+    response = client.post('/recommend', json={'title': 'blood & water', 'content_type': 'movies'})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['content_type'] == 'shows'
+    assert body['recommendations']
+    assert {item['content_type'] for item in body['recommendations']} == {'movies'}
+
+
+def test_result_type_restricts_recommendations_across_catalogs(client):
+    response = client.post('/recommend', json={
+        'title': 'Dick Johnson Is Dead', 'content_type': 'movies', 'result_type': 'shows', 'count': 8,
+    })
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['content_type'] == 'movies'
+    assert len(body['recommendations']) == 8
+    assert {item['content_type'] for item in body['recommendations']} == {'shows'}
+
+    response = client.post('/recommend', json={'title': 'Blood & Water', 'content_type': 'all'})
+    assert response.status_code == 200
+    assert 'Blood & Water' not in [item['title'] for item in response.get_json()['recommendations']]
+
+
+def test_profile_header_returns_a_stage_breakdown(client):
+    import app
+    app.recommendation_cache.invalidate()
+    request = {'title': 'Dick Johnson Is Dead', 'count': 4}
+    assert 'Server-Timing' not in client.post('/recommend', json=request).headers
+
+    app.recommendation_cache.invalidate()
+    response = client.post('/recommend', json=request, headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    stages = dict(entry.split(';dur=') for entry in response.headers['Server-Timing'].split(', '))
+    for stage in ('title_normalization', 'cache_lookup', 'scoring', 'response_building', 'total'):
+        assert float(stages[stage]) >= 0
+    assert list(stages)[-1] == 'total'
+
+
+def test_metrics_exposes_stage_request_and_cache_metrics(client):
+    client.post('/recommend', json={'title': 'Dick Johnson Is Dead'})
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    for line in (
+        '# TYPE recommender_stage_seconds histogram',
+        'recommender_stage_seconds_count{stage="scoring"}',
+        'recommender_request_seconds_bucket{endpoint="/recommend",le="+Inf"}',
+        'recommender_requests_total{endpoint="/recommend",status="200"}',
+        '# TYPE recommender_cache_hits_total counter',
+        'recommender_cache_entries ',
+    ):
+        assert line in text
+
+
+def test_batch_resolves_titles_like_single_requests(client):
+    titles = ['dick johnson is dead', 'Blood & Water', 'Dik Jonson Is Ded', 42]
+    for options in ({}, {'result_type': 'shows'}):
+        response = client.post('/recommend/batch', json={'titles': titles, 'count': 4, **options})
+        assert response.status_code == 200
+        results = response.get_json()['results']
+        assert len(results) == len(titles)
+        for title, result in zip(titles, results):
+            single = client.post('/recommend', json={'title': title, 'count': 4, **options})
+            body = single.get_json()
+            assert result['title'] == title
+            if single.status_code == 200:
+                assert result['recommendations'] == body['recommendations']
+                assert result['content_type'] == body['content_type']
+            else:
+                assert result['error'] == body['error']
+                assert result['available_titles'] == body['available_titles']
+        assert results[2]['available_titles'][0] == 'Dick Johnson Is Dead'
+
+    response = client.post('/recommend/batch', json={'titles': titles, 'result_type': 'songs'})
+    assert response.status_code == 400
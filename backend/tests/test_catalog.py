@@ -0,0 +1,27 @@
+from catalog import Catalog, SERVING_COLUMNS
+
+
+def test_memory_usage_counts_every_index(data_manager):
+    catalog = data_manager.get_catalog('shows')
+    catalog = Catalog.from_frame('shows', catalog.frame, catalog.source_path,
+                                 catalog.source_mtime, catalog.source_hash, catalog.feature_index)
+    before = catalog.memory_usage()
+    assert before['search_index'] == 0
+    assert before['title_index'] > 0 and before['vocabulary'] > 0
+    # Descriptions are the frame's own strings, counted once with the frame
+    assert before['descriptions'] < 16 * len(catalog)
+
+    catalog.search_index
+    after = catalog.memory_usage()
+    assert after['search_index'] > 0
+    assert after['total'] == sum(size for part, size in after.items() if part != 'total')
+    assert catalog.compacted().memory_usage()['total'] < before['total']
+
+
+def test_combined_catalog_keeps_only_serving_columns(data_manager):
+    combined = Catalog.combine('all', [data_manager.get_catalog('movies'),
+                                       data_manager.get_catalog('shows')])
+    assert set(combined.frame.columns) <= set(SERVING_COLUMNS)
+    assert combined.record(0)['content_type'] == 'movies'
+    assert combined.record(len(combined) - 1)['content_type'] == 'shows'
+    assert combined.record(0)['description'] == data_manager.get_catalog('movies').record(0)['description']
@@ -0,0 +1,77 @@
+import os
+import threading
+import pandas as pd
+from data_manager import DataManager
+
+
+def write_csv(path, titles):
+    pd.DataFrame({
+        'title': titles,
+        'listed_in': ['Dramas'] * len(titles),
+        'description': [f'{title} story' for title in titles],
+    }).to_csv(path, index=False)
+
+
+def test_readers_keep_the_current_snapshot_while_a_reload_runs(tmp_path, monkeypatch):
+    path = str(tmp_path / 'catalog.csv')
+    write_csv(path, ['First', 'Second'])
+    data_manager = DataManager(movies_path=path, shows_path=path, use_cache=False)
+    original = data_manager.get_catalog('movies')
+
+    write_csv(path, ['First', 'Second', 'Third'])
+    os.utime(path, (original.source_mtime + 10, original.source_mtime + 10))
+
+    parsing = threading.Event()
+    release = threading.Event()
+    read_frame = DataManager._read_frame
+
+    def slow_read_frame(*args, **kwargs):
+        parsing.set()
+        release.wait(10)
+        return read_frame(*args, **kwargs)
+
+    monkeypatch.setattr(DataManager, '_read_frame', staticmethod(slow_read_frame))
+    reloaded = []
+    reloader = threading.Thread(target=lambda: reloaded.append(data_manager.get_catalog('movies')))
+    reloader.start()
+    try:
+        assert parsing.wait(10)
+        # The reload is stuck parsing; readers get the published snapshot without waiting
+        assert data_manager.get_catalog('movies') is original
+    finally:
+        release.set()
+        reloader.join(10)
+
+    assert len(reloaded[0]) == 3
+    assert data_manager.get_catalog('movies') is reloaded[0]
+
+
+def test_edited_titles_fill_missing_served_columns(tmp_path):
+    path = str(tmp_path / 'catalog.csv')
+    write_csv(path, ['First', 'Second'])
+    data_manager = DataManager(movies_path=path, shows_path=path, use_cache=False)
+
+    catalog = data_manager.add_titles('movies', [{'title': 'Added', 'listed_in': 'Dramas'}])
+    catalog = data_manager.update_titles('movies', {'First': {'description': None}})
+    assert catalog.title_index.payload(catalog.title_index.row('Added')) == {
+        'title': 'Added', 'description': '',
+    }
+    assert catalog.record(catalog.title_index.row('First'))['description'] == ''
+    assert catalog.record(catalog.title_index.row('Second'))['description'] == 'Second story'
+
+
+def test_cache_written_by_a_compact_manager_keeps_every_column(tmp_path):
+    path = str(tmp_path / 'catalog.csv')
+    pd.DataFrame({
+        'title': ['First', 'Second'],
+        'director': ['Someone', 'Else'],
+        'listed_in': ['Dramas', 'Comedies'],
+        'description': ['A story.', 'Another story.'],
+    }).to_csv(path, index=False)
+    compact = DataManager(movies_path=path, shows_path=path, compact=True)
+    compact.add_titles('movies', [{'title': 'Edited', 'description': 'Only in memory.'}])
+    compact.build_cache()
+
+    catalog = DataManager(movies_path=path, shows_path=path).get_catalog('movies')
+    assert catalog.title_index.titles == ['First', 'Second']
+    assert catalog.record(0)['director'] == 'Someone'
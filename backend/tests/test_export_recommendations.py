@@ -0,0 +1,40 @@
+import json
+import pytest
+from export_recommendations import export, remove_stale_parts
+
+ROWS = [
+    {'title': f'Title {row}', 'listed_in': 'Dramas', 'description': f'A story number {row % 3}.'}
+    for row in range(7)
+]
+
+
+def test_resume_rejects_another_chunk_size(write_catalog, tmp_path):
+    data_manager = write_catalog(ROWS)
+    output = str(tmp_path / 'out.jsonl')
+    export(data_manager, output, k=3, chunk_size=2, workers=1)
+    with open(output + '.checkpoint.json', encoding='utf-8') as source:
+        assert json.load(source)['chunk_size'] == 2
+
+    with pytest.raises(ValueError, match='chunk-size'):
+        export(data_manager, output, k=3, chunk_size=4, workers=1)
+    # --restart starts over with the new chunk size
+    export(data_manager, output, k=3, chunk_size=4, workers=1, restart=True)
+    with open(output, encoding='utf-8') as source:
+        assert len(source.readlines()) == 2 * len(ROWS)
+
+
+def test_stale_parquet_parts_are_removed(tmp_path):
+    names = [
+        'part-movies-000000000.parquet', 'part-movies-000000256.parquet',
+        'part-movies-000000512.parquet', 'part-movies-000000512.parquet.tmp',
+        'part-shows-000000000.parquet', 'other.txt',
+    ]
+    for name in names:
+        (tmp_path / name).write_bytes(b'')
+
+    remove_stale_parts(str(tmp_path), {'movies': 512, 'shows': 0})
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        'other.txt', 'part-movies-000000000.parquet', 'part-movies-000000256.parquet',
+    ]
+    remove_stale_parts(str(tmp_path), None)
+    assert [path.name for path in tmp_path.iterdir()] == ['other.txt']
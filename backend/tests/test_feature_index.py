@@ -0,0 +1,193 @@
+"""
+Parity of the vectorized scoring paths with the scalar content similarity.
+
+The scalar reference is SimilarityCalculator.calculate_content_similarity
+applied to one pair of rows at a time, as the recommenders did before the
+feature index existed. The vectorized paths accumulate the same terms in the
+same order, so scores are compared for exact equality.
+"""
+import random
+from typing import Any, Dict, List
+import numpy as np
+import pandas as pd
+import pytest
+from feature_index import FeatureIndex
+from parallel_scoring import ParallelScorer
+from recommender import ContentRecommender, UserBasedRecommender
+from similarity import SimilarityCalculator
+
+CONTENT_TYPES = ('movies', 'shows')
+SAMPLED_ROWS = 5
+
+
+def records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Rows as the dictionaries the scalar path compares, with missing values as ''."""
+    return frame.fillna('').astype(str).to_dict('records')
+
+
+def scalar_similarity(rows: List[Dict[str, Any]], row: int) -> np.ndarray:
+    """Similarity of one row against every row, one pair at a time."""
+    calculator = SimilarityCalculator()
+    return np.array([calculator.calculate_content_similarity(rows[row], other) for other in rows])
+
+
+@pytest.mark.parametrize('content_type', CONTENT_TYPES)
+def test_similarity_matches_scalar_path(data_manager, content_type):
+    catalog = data_manager.get_catalog(content_type)
+    rows = records(catalog.frame)
+    for row in random.Random(0).sample(range(len(rows)), SAMPLED_ROWS):
+        assert np.array_equal(catalog.feature_index.similarity(row), scalar_similarity(rows, row))
+
+
+@pytest.mark.parametrize('content_type', CONTENT_TYPES)
+def test_similarity_ranges_and_selected_rows_match_full_scan(data_manager, content_type):
+    feature_index = data_manager.get_catalog(content_type).feature_index
+    row = 7
+    scores = feature_index.similarity(row)
+    assert np.array_equal(feature_index.similarity(row, 100, 900), scores[100:900])
+    selected = [5, 0, 42, len(scores) - 1]
+    assert np.array_equal(feature_index.similarity_to_rows(row, selected), scores[selected])
+
+
+@pytest.mark.parametrize('content_type', CONTENT_TYPES)
+def test_row_similarity_intersects_stored_token_ids(data_manager, content_type):
+    feature_index = data_manager.get_catalog(content_type).feature_index
+    calculator = SimilarityCalculator()
+    row = 11
+    scores = feature_index.similarity(row)
+    for other in random.Random(5).sample(range(len(feature_index)), 50):
+        assert calculator.calculate_content_similarity(row, other, feature_index) == scores[other]
+
+
+def test_building_an_index_leaves_the_text_memo_empty(data_manager):
+    SimilarityCalculator.preprocess_text.cache_clear()
+    FeatureIndex.from_frame(data_manager.get_catalog('shows').frame)
+    assert SimilarityCalculator.preprocess_text.cache_info().currsize == 0
+
+
+def test_edge_cases_match_scalar_path():
+    frame = pd.DataFrame({
+        'title': ['Alpha', 'Alpha', 'The And Of', '', 'Beta Gamma', 'Delta'],
+        'listed_in': ['Dramas', 'Dramas, Comedies', None, '', 'Comedies', 'the'],
+        'description': [
+            'A heist goes wrong in the city.',
+            'A heist in the city goes right.',
+            'the and of a an',  # only stop words
+            '',
+            None,
+            'A city of heists.',
+        ],
+    })
+    feature_index = FeatureIndex.from_frame(frame)
+    rows = records(frame)
+    for row in range(len(frame)):
+        assert np.array_equal(feature_index.similarity(row), scalar_similarity(rows, row))
+
+    # Rows with nothing left after preprocessing score zero against everything
+    assert not feature_index.similarity(2).any()
+    assert not feature_index.similarity(3).any()
+
+
+def test_field_missing_from_frame_counts_as_empty():
+    frame = pd.DataFrame({'title': ['Night Train', 'Night Shift', 'Day Trip']})
+    feature_index = FeatureIndex.from_frame(frame)
+    rows = [{'title': title} for title in frame['title']]
+    for row in range(len(frame)):
+        assert np.array_equal(feature_index.similarity(row), scalar_similarity(rows, row))
+
+
+def test_duplicate_titles_are_never_recommended_for_themselves(write_catalog):
+    data_manager = write_catalog([
+        {'title': 'Echo', 'listed_in': 'Dramas', 'description': 'A singer returns home.'},
+        {'title': 'Other', 'listed_in': 'Dramas', 'description': 'A singer leaves home.'},
+        {'title': 'Echo', 'listed_in': 'Dramas', 'description': 'A singer returns home again.'},
+        {'title': 'Far', 'listed_in': 'Comedies', 'description': 'Nothing alike.'},
+    ])
+    recommender = ContentRecommender(data_manager, SimilarityCalculator())
+    recommendations = recommender.find_similar_content('echo', 5, 'movies')
+    assert [title for title, _ in recommendations] == ['Other', 'Far']
+
+
+def scalar_ratings(rows: List[Dict[str, Any]], user_ratings: Dict[str, float], count: int):
+    """recommend_from_ratings computed one pair at a time, as before vectorization."""
+    calculator = SimilarityCalculator()
+    first_rows = {}
+    for row, record in enumerate(rows):
+        first_rows.setdefault(record['title'], row)
+    recommendations = []
+    for record in rows:
+        if record['title'] in user_ratings:
+            continue
+        total_score = 0.0
+        for rated_title, rating in user_ratings.items():
+            similarity = calculator.calculate_content_similarity(rows[first_rows[rated_title]], record)
+            total_score += similarity * (rating / 5.0)
+        recommendations.append((record['title'], total_score))
+    return sorted(recommendations, key=lambda item: item[1], reverse=True)[:count]
+
+
+@pytest.mark.parametrize('content_type', CONTENT_TYPES)
+def test_ratings_match_scalar_path(data_manager, content_type):
+    catalog = data_manager.get_catalog(content_type)
+    rows = records(catalog.frame)
+    random_state = random.Random(1)
+    titles = catalog.title_index.titles
+    users = [
+        {title: random_state.randint(1, 5) for title in random_state.sample(titles, 3)}
+        for _ in range(3)
+    ] + [{}]
+    recommender = UserBasedRecommender(data_manager, SimilarityCalculator())
+
+    results = recommender.recommend_from_ratings_batch(users, 10, content_type, users_per_chunk=2)
+    for user_ratings, result in zip(users, results):
+        expected = scalar_ratings(rows, user_ratings, 10) if user_ratings else []
+        assert result == expected
+        assert recommender.recommend_from_ratings(user_ratings, 10, content_type) == expected
+
+
+@pytest.mark.parametrize('content_type', CONTENT_TYPES)
+def test_batch_matches_single_title_scoring(data_manager, content_type):
+    catalog = data_manager.get_catalog(content_type)
+    titles = random.Random(2).sample(catalog.title_index.titles, 7)
+    # A lookup that differs only in case and punctuation, a repeat and a missing title
+    titles += [titles[0].upper() + '!', titles[1], 'No Such Title Anywhere']
+    recommender = ContentRecommender(data_manager, SimilarityCalculator())
+
+    other_type = 'shows' if content_type == 'movies' else 'movies'
+    for result_type in (None, content_type, other_type):
+        results = recommender.find_similar_content_batch(
+            titles, 10, content_type, rows_per_block=3, result_type=result_type
+        )
+        assert len(results) == len(titles)
+        for title, result in zip(titles[:-1], results):
+            assert result == recommender.find_similar_content(title, 10, content_type, result_type)
+        assert isinstance(results[-1], ValueError)
+    with pytest.raises(ValueError):
+        recommender.find_similar_content(titles[-1], 10, content_type)
+
+
+@pytest.mark.parametrize('content_type', CONTENT_TYPES)
+def test_sharded_scoring_matches_serial(data_manager, content_type):
+    catalog = data_manager.get_catalog(content_type)
+    random_state = random.Random(4)
+    titles = random_state.sample(catalog.title_index.titles, 5)
+    users = [
+        {title: random_state.randint(1, 5) for title in random_state.sample(catalog.title_index.titles, 3)}
+        for _ in range(3)
+    ] + [{}]
+    # Uneven shards smaller than the catalog, so every query spans several
+    scorer = ParallelScorer(max_workers=3, serial_threshold=0, min_shard_rows=97)
+    assert len(scorer.shard_bounds(len(catalog))) == 3
+
+    serial = ContentRecommender(data_manager, SimilarityCalculator())
+    sharded = ContentRecommender(data_manager, SimilarityCalculator(), parallel_scorer=scorer)
+    for title in titles:
+        assert sharded.find_similar_content(title, 10, content_type) == \
+            serial.find_similar_content(title, 10, content_type)
+        assert sharded.find_similar_content(title, 10, data_manager.ALL_CONTENT, content_type) == \
+            serial.find_similar_content(title, 10, data_manager.ALL_CONTENT, content_type)
+
+    serial = UserBasedRecommender(data_manager, SimilarityCalculator())
+    sharded = UserBasedRecommender(data_manager, SimilarityCalculator(), parallel_scorer=scorer)
+    assert sharded.recommend_from_ratings_batch(users, 10, content_type, users_per_chunk=2) == \
+        serial.recommend_from_ratings_batch(users, 10, content_type, users_per_chunk=2)
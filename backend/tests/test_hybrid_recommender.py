@@ -0,0 +1,25 @@
+from benchmark import _import_hybrid_recommender
+from data_manager import DataManager
+from recommender import ContentRecommender, UserBasedRecommender
+from similarity import SimilarityCalculator
+from conftest import MOVIES_PATH, SHOWS_PATH
+
+
+def test_recommendations_exclude_the_query_and_rated_titles():
+    data_manager = DataManager(movies_path=MOVIES_PATH, shows_path=SHOWS_PATH, use_cache=False)
+    data_manager.load_content('movies')
+    similarity_calculator = SimilarityCalculator()
+    hybrid = _import_hybrid_recommender()(
+        ContentRecommender(data_manager, similarity_calculator),
+        UserBasedRecommender(data_manager, similarity_calculator)
+    )
+    titles = data_manager.get_catalog().frame['title'].tolist()
+    query = titles[0]
+    # The user rated the query's closest matches, so the query ranks high for them
+    rated = [title for title, _ in hybrid.content_recommender.find_similar_content(query, 3)]
+    user_ratings = {title: 5.0 for title in rated}
+
+    recommendations = hybrid.get_recommendations(query.upper(), user_ratings, 10)
+
+    assert len(recommendations) == 10
+    assert not set(recommendations) & set(rated + [query])
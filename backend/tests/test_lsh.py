@@ -0,0 +1,59 @@
+import numpy as np
+from lsh import LSHCandidateGenerator, MinHashLSH
+from recommender import ContentRecommender
+from similarity import SimilarityCalculator
+
+GENRES = ['Dramas', 'Comedies', 'Thrillers', 'Documentaries', 'Horror Movies', 'Anime Features']
+WORDS = ['heist', 'island', 'wedding', 'robot', 'haunted', 'ocean', 'courtroom', 'band']
+
+
+def grouped_rows():
+    """Six groups of five near-identical titles, plus one title unlike any other."""
+    rows = []
+    for group, genre in enumerate(GENRES):
+        theme = ' '.join(f'{word}{group}' for word in WORDS)
+        for member in range(5):
+            rows.append({
+                'title': f'Story {group} Part {member}',
+                'listed_in': genre,
+                'description': f'{theme} chapter{member}',
+            })
+    rows.append({'title': 'Lonely', 'listed_in': 'Stand-Up Comedy', 'description': 'Nothing alike.'})
+    return rows
+
+
+def test_lsh_candidates_give_the_exact_top_k(write_catalog):
+    data_manager = write_catalog(grouped_rows())
+    catalog = data_manager.get_catalog('movies')
+    generator = LSHCandidateGenerator(seed=7)
+    exact = ContentRecommender(data_manager, SimilarityCalculator())
+    approximate = ContentRecommender(data_manager, SimilarityCalculator(), candidate_generator=generator)
+    for group in range(len(GENRES)):
+        title = f'Story {group} Part 0'
+        # Enough candidates to serve the request, from a fraction of the catalog
+        candidates = generator.candidates(catalog, catalog.title_index.row(title))
+        assert 4 <= len(candidates) < len(catalog) // 2
+        result = approximate.find_similar_content(title, 4, 'movies')
+        assert result == exact.find_similar_content(title, 4, 'movies')
+        assert {title for title, _ in result} == {f'Story {group} Part {member}' for member in range(1, 5)}
+
+
+def test_too_few_candidates_fall_back_to_a_full_scan(write_catalog):
+    data_manager = write_catalog(grouped_rows())
+    generator = LSHCandidateGenerator(seed=7)
+    catalog = data_manager.get_catalog('movies')
+    row = catalog.title_index.row('Lonely')
+    assert len(generator.candidates(catalog, row)) < 10
+
+    exact = ContentRecommender(data_manager, SimilarityCalculator())
+    approximate = ContentRecommender(data_manager, SimilarityCalculator(), candidate_generator=generator)
+    result = approximate.find_similar_content('Lonely', 10, 'movies')
+    assert len(result) == 10
+    assert result == exact.find_similar_content('Lonely', 10, 'movies')
+
+
+def test_signatures_are_deterministic_per_seed(data_manager):
+    feature_index = data_manager.get_catalog('shows').feature_index
+    first, second = MinHashLSH(feature_index, seed=3), MinHashLSH(feature_index, seed=3)
+    for row in (0, 100, 2000):
+        assert np.array_equal(first.candidates(row), second.candidates(row))
@@ -0,0 +1,93 @@
+import json
+import os
+import random
+import numpy as np
+import pandas as pd
+import neighbors
+from data_manager import DataManager
+from feature_index import FeatureIndex
+from recommender import ContentRecommender
+from similarity import SimilarityCalculator
+from conftest import MOVIES_PATH
+
+K = 10
+
+
+def build(feature_index, frame):
+    return neighbors.build_table(feature_index, frame['title'].tolist(), K, chunk_size=64, workers=1)
+
+
+def test_update_table_matches_a_full_build_after_random_edits():
+    random_state = random.Random(3)
+    frame = pd.read_csv(MOVIES_PATH).head(400)
+    feature_index = FeatureIndex.from_frame(frame)
+    table = build(feature_index, frame)
+
+    for _ in range(4):
+        removed = random_state.sample(range(len(frame)), 15)
+        kept_rows = np.setdiff1d(np.arange(len(frame)), removed)
+        edited = frame.iloc[kept_rows].reset_index(drop=True)
+        # Updates borrow another row's fields; added rows copy one under a new
+        # title or, for duplicate titles, the same one
+        updated = sorted(random_state.sample(range(len(edited)), 10))
+        for row in updated:
+            donor = random_state.randrange(len(frame))
+            for column in ('listed_in', 'description'):
+                edited.loc[row, column] = frame.loc[donor, column]
+        added = frame.iloc[random_state.sample(range(len(frame)), 10)].copy()
+        added.loc[added.index[:5], 'title'] = [f'Added {index}' for index in added.index[:5]]
+        edited = pd.concat([edited, added], ignore_index=True)
+        changed_rows = np.concatenate([updated, np.arange(len(kept_rows), len(edited))])
+
+        edited_index = feature_index.with_rows(kept_rows, edited, changed_rows)
+        updated_table = neighbors.update_table(
+            table, edited_index, edited['title'].tolist(), kept_rows, changed_rows
+        )
+        expected = build(FeatureIndex.from_frame(edited), edited)
+        assert np.array_equal(updated_table.ids, expected.ids)
+        assert np.array_equal(updated_table.scores, expected.scores)
+
+        frame, feature_index, table = edited, edited_index, updated_table
+
+
+def saved_table_manager(tmp_path):
+    """DataManager over a 400-title CSV with a neighbor table saved for it."""
+    path = str(tmp_path / 'catalog.csv')
+    pd.read_csv(MOVIES_PATH).head(400).to_csv(path, index=False)
+    catalog = DataManager(movies_path=path, shows_path=path, use_cache=False).get_catalog('movies')
+    neighbors.save_table(build(catalog.feature_index, catalog.frame), path, catalog.source_hash)
+    return path, catalog
+
+
+def test_saved_table_serves_the_live_results(tmp_path):
+    path, _ = saved_table_manager(tmp_path)
+    data_manager = DataManager(movies_path=path, shows_path=path)
+    catalog = data_manager.get_catalog('movies')
+    assert catalog.neighbor_table is not None
+
+    live = ContentRecommender(data_manager, SimilarityCalculator())
+    served = ContentRecommender(data_manager, SimilarityCalculator(), use_neighbor_table=True)
+    for title in random.Random(6).sample(catalog.title_index.titles, 20):
+        for count in (1, 5, K):
+            assert served.find_similar_content(title, count, 'movies') == \
+                live.find_similar_content(title, count, 'movies')
+
+
+def test_table_from_another_version_is_ignored(tmp_path):
+    path, built = saved_table_manager(tmp_path)
+    meta_path = os.path.join(neighbors.table_dir(path, built.source_hash), 'meta.json')
+    with open(meta_path, encoding='utf-8') as source:
+        meta = json.load(source)
+    meta['neighbors_version'] = neighbors.NEIGHBORS_VERSION + 1
+    with open(meta_path, 'w', encoding='utf-8') as output:
+        json.dump(meta, output)
+
+    assert neighbors.load_table(path, built.source_hash) is None
+    # A table is only found for the source hash it was built from
+    assert neighbors.load_table(path, 'f' * 64) is None
+    data_manager = DataManager(movies_path=path, shows_path=path)
+    assert data_manager.get_catalog('movies').neighbor_table is None
+    title = built.title_index.title(0)
+    served = ContentRecommender(data_manager, SimilarityCalculator(), use_neighbor_table=True)
+    assert served.find_similar_content(title, 5, 'movies') == \
+        ContentRecommender(data_manager, SimilarityCalculator()).find_similar_content(title, 5, 'movies')
@@ -0,0 +1,44 @@
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import pytest
+from scoring_pool import PoolSaturatedError, ScoringPool
+
+
+def test_jobs_that_outlive_their_timeout_keep_their_slot():
+    pool = ScoringPool(max_workers=1, max_pending=1, timeout=0.05)
+    release = threading.Event()
+    try:
+        with pytest.raises(FutureTimeoutError):
+            pool.run(release.wait, 10)
+        # The timed-out job is still running, so the pool is still full
+        with pytest.raises(PoolSaturatedError):
+            pool.run(sum, [1, 2])
+        release.set()
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                assert pool.run(sum, [1, 2]) == 3
+                break
+            except PoolSaturatedError:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_timed_out_jobs_that_never_started_are_cancelled():
+    pool = ScoringPool(max_workers=1, max_pending=2, timeout=0.05)
+    release = threading.Event()
+    started = []
+    try:
+        with pytest.raises(FutureTimeoutError):
+            pool.run(release.wait, 10)
+        with pytest.raises(FutureTimeoutError):
+            pool.run(started.append, 'queued')
+        release.set()
+        pool.shutdown()
+        assert started == []
+    finally:
+        release.set()
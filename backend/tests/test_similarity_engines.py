@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from catalog import Catalog
+from recommender import ContentRecommender
+from similarity import SimilarityCalculator
+from similarity_engines import JaccardEngine, TfidfCosineEngine
+
+sklearn = pytest.importorskip('sklearn')
+from sklearn.feature_extraction.text import TfidfVectorizer  # noqa: E402
+from sklearn.metrics.pairwise import cosine_similarity  # noqa: E402
+
+FRAME = pd.DataFrame({
+    'title': ['Night Train', 'Night Shift', 'Day Trip', 'The Heist', 'Quiet'],
+    'listed_in': ['Dramas, Thrillers', 'Dramas', 'Comedies', 'Thrillers', None],
+    'description': [
+        'A detective boards a night train to catch a thief.',
+        'A nurse works the night shift in a busy city hospital.',
+        'Friends take a road trip and get lost.',
+        'A thief plans one last heist on a train.',
+        'the and of',  # only stop words
+    ],
+})
+
+
+def sklearn_tfidf_cosine(frame: pd.DataFrame) -> np.ndarray:
+    """Weighted sum of per-field cosine similarities of scikit-learn TF-IDF vectors."""
+    scores = np.zeros((len(frame), len(frame)))
+    for field, weight in SimilarityCalculator.FEATURE_WEIGHTS.items():
+        vectorizer = TfidfVectorizer(analyzer=SimilarityCalculator._tokenize, binary=True)
+        vectors = vectorizer.fit_transform(frame[field].fillna('').astype(str))
+        scores += weight * cosine_similarity(vectors)
+    return scores
+
+
+def test_tfidf_scores_match_scikit_learn():
+    catalog = Catalog.from_frame('movies', FRAME, '', 0.0, 'test')
+    engine = TfidfCosineEngine()
+    expected = sklearn_tfidf_cosine(FRAME)
+    for row in range(len(FRAME)):
+        assert np.allclose(engine.similarity(catalog, row), expected[row])
+        assert np.allclose(engine.similarity_to_rows(catalog, row, [4, 0, 2]), expected[row, [4, 0, 2]])
+    assert np.allclose(engine.similarity_block(catalog, [1, 3], 1, 4), expected[[1, 3], 1:4])
+
+
+def test_engine_selection_changes_the_ranking(data_manager):
+    recommender = ContentRecommender(data_manager, SimilarityCalculator(), engines={
+        JaccardEngine.name: JaccardEngine(), TfidfCosineEngine.name: TfidfCosineEngine(),
+    })
+    title = data_manager.get_catalog('movies').title_index.title(0)
+    jaccard = recommender.find_similar_content(title, 10, 'movies', engine='jaccard')
+    tfidf = recommender.find_similar_content(title, 10, 'movies', engine='tfidf')
+    assert recommender.find_similar_content(title, 10, 'movies') == jaccard
+    assert [title for title, _ in tfidf] != [title for title, _ in jaccard]
+    with pytest.raises(ValueError, match='Unknown similarity engine'):
+        recommender.find_similar_content(title, 10, 'movies', engine='bm25')
@@ -0,0 +1,112 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+import sys
+import numpy as np
+
+
+def objects_nbytes(objects: Iterable[Any], seen: Set[int]) -> int:
+    """
+    sys.getsizeof of each object not already counted.
+
+    seen holds the ids of objects measured so far and is updated, so objects
+    shared between structures are counted once. Every object must stay
+    referenced while seen is in use, or its id could be reused.
+    """
+    total = 0
+    for value in objects:
+        if id(value) not in seen:
+            seen.add(id(value))
+            total += sys.getsizeof(value)
+    return total
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase a title and strip punctuation so lookups ignore case and punctuation."""
+    return ''.join(c.lower() for c in title if c.isalnum() or c.isspace()).strip()
+
+
+class TitleIndex:
+    """
+    Hash index over a catalog's titles, built once per catalog.
+
+    Maps normalized titles and exact titles to row ids, and row ids back to
+    the payload the API returns, so every lookup on the request path is a
+    dict or list access.
+    """
+
+    def __init__(self, titles: Sequence[str], descriptions: Sequence[str]):
+        """Build the index from the title and description columns of a catalog."""
+        self.titles: List[str] = list(titles)
+        self.descriptions = descriptions
+
+        # Exact title -> first row with that title, plus every row for
+        # titles that appear more than once
+        self._exact_rows: Dict[str, int] = {}
+        self._duplicate_rows: Dict[str, List[int]] = {}
+        # Normalized title -> exact title; when several titles normalize to the
+        # same key, the last one wins
+        normalized_titles: Dict[str, str] = {}
+        for row, title in enumerate(self.titles):
+            first_row = self._exact_rows.setdefault(title, row)
+            if first_row != row:
+                self._duplicate_rows.setdefault(title, [first_row]).append(row)
+            normalized_titles[normalize_title(title)] = title
+
+        self._normalized_rows: Dict[str, int] = {
+            normalized: self._exact_rows[title]
+            for normalized, title in normalized_titles.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def __contains__(self, title: str) -> bool:
+        return self.lookup(title) is not None
+
+    def lookup(self, title: str) -> Optional[int]:
+        """Row id for a title, ignoring case and punctuation, or None if absent."""
+        return self._normalized_rows.get(normalize_title(title))
+
+    def row(self, title: str) -> Optional[int]:
+        """Row id of the first row with exactly this title, or None if absent."""
+        return self._exact_rows.get(title)
+
+    def rows(self, title: str) -> List[int]:
+        """Every row with exactly this title."""
+        if title in self._duplicate_rows:
+            return self._duplicate_rows[title]
+        row = self._exact_rows.get(title)
+        return [] if row is None else [row]
+
+    def exclusion_mask(self, titles: Iterable[str]) -> np.ndarray:
+        """Boolean mask over all rows, set for every row with one of the given titles."""
+        mask = np.zeros(len(self.titles), dtype=bool)
+        for title in titles:
+            mask[self.rows(title)] = True
+        return mask
+
+    def title(self, row: int) -> str:
+        """Title stored at a row."""
+        return self.titles[row]
+
+    def description(self, row: int) -> str:
+        """Description stored at a row."""
+        return self.descriptions[row]
+
+    def nbytes(self, seen: Set[int]) -> int:
+        """
+        Bytes held by the title list and the lookup dictionaries, with the
+        strings and lists they reference, skipping objects already in seen.
+        Descriptions are not included.
+        """
+        containers = [self.titles, self._exact_rows, self._duplicate_rows, self._normalized_rows]
+        return (objects_nbytes(containers, seen)
+                + objects_nbytes(self.titles, seen)
+                + objects_nbytes(self._normalized_rows, seen)
+                + objects_nbytes(self._duplicate_rows.values(), seen))
+
+    def payload(self, row: int) -> Dict[str, str]:
+        """Title and description of a row, as returned by the API."""
+        return {
+            'title': self.titles[row],
+            'description': self.descriptions[row],
+        }
@@ -0,0 +1,150 @@
+"""
+Autocomplete and typo-tolerant search over a catalog's titles.
+
+Titles are matched on their normalized form (see normalize_title) in two ways:
+
+- prefix: sorted arrays of the titles and of every word-start suffix of
+  every title, so titles starting with the query, then titles with a later
+  word starting with it ("godf" finds "The Godfather"), are one binary
+  search away;
+- fuzzy: an inverted index from character trigrams to titles, so a
+  misspelled query still finds titles sharing most of its trigrams, ranked
+  by the Jaccard similarity of the two trigram sets.
+
+Prefix matches are listed first, then fuzzy ones. The index is built once
+per catalog, on first use.
+"""
+from bisect import bisect_left
+from typing import Dict, FrozenSet, List, Sequence, Set, Tuple
+import numpy as np
+from title_index import normalize_title, objects_nbytes
+from topk import top_k_rows
+
+# Fuzzy matches sharing less than this fraction of trigrams are dropped
+MIN_FUZZY_SIMILARITY = 0.3
+# Word-start suffixes examined per query; bounds the scan for queries like "t"
+MAX_PREFIX_SCAN = 1000
+
+
+def search_key(title: str) -> str:
+    """Normalized title with runs of whitespace collapsed, as stored in the index."""
+    return ' '.join(normalize_title(title).split())
+
+
+def trigrams(key: str) -> FrozenSet[str]:
+    """Character trigrams of each word of a search key, padded to mark word boundaries."""
+    grams = set()
+    for word in key.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TitleSearchIndex:
+    """Sorted title and word-suffix arrays plus a trigram inverted index over one catalog's titles."""
+
+    def __init__(self, titles: Sequence[str]):
+        """Build the index; titles that normalize to the same key resolve to the first row."""
+        key_rows: Dict[str, int] = {}
+        for row, title in enumerate(titles):
+            key = search_key(title)
+            if key:
+                key_rows.setdefault(key, row)
+        self.keys: List[str] = list(key_rows)
+        self.rows = np.fromiter(key_rows.values(), dtype=np.intp, count=len(key_rows))
+
+        # Every suffix of a key starting at a word, sorted, with the key it came from
+        suffixes: List[Tuple[str, int]] = []
+        postings: Dict[str, List[int]] = {}
+        gram_counts = np.zeros(len(self.keys), dtype=np.int32)
+        for key_id, key in enumerate(self.keys):
+            start = 0
+            for word in key.split(' '):
+                suffixes.append((key[start:], key_id))
+                start += len(word) + 1
+            grams = trigrams(key)
+            gram_counts[key_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+        suffixes.sort()
+        self._sorted_keys = sorted(self.keys)
+        self._sorted_key_ids = np.array(
+            sorted(range(len(self.keys)), key=self.keys.__getitem__), dtype=np.intp
+        )
+        self._suffixes = [suffix for suffix, _ in suffixes]
+        self._suffix_keys = np.array([key_id for _, key_id in suffixes], dtype=np.intp)
+        self._postings = {gram: np.array(ids, dtype=np.intp) for gram, ids in postings.items()}
+        self._gram_counts = gram_counts
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def nbytes(self, seen: Set[int]) -> int:
+        """Bytes held by the key, suffix and trigram structures, skipping objects already in seen."""
+        arrays = [self.rows, self._sorted_key_ids, self._suffix_keys, self._gram_counts,
+                  *self._postings.values()]
+        containers = [self.keys, self._sorted_keys, self._suffixes, self._postings]
+        return (sum(array.nbytes for array in arrays)
+                + objects_nbytes(containers, seen)
+                + objects_nbytes(self.keys, seen)
+                + objects_nbytes(self._suffixes, seen)
+                + objects_nbytes(self._postings, seen))
+
+    def prefix_matches(self, query: str, limit: int = 10) -> List[int]:
+        """
+        Rows of titles with a word starting with the query.
+
+        Titles that start with the query come first, then titles with a
+        later word starting with it, each in alphabetical order.
+        """
+        key = search_key(query)
+        if not key:
+            return []
+        key_ids: List[int] = []
+        position = bisect_left(self._sorted_keys, key)
+        while (len(key_ids) < limit and position < len(self._sorted_keys)
+               and self._sorted_keys[position].startswith(key)):
+            key_ids.append(int(self._sorted_key_ids[position]))
+            position += 1
+
+        position = start = bisect_left(self._suffixes, key)
+        while (len(key_ids) < limit and position < len(self._suffixes)
+               and position - start < MAX_PREFIX_SCAN
+               and self._suffixes[position].startswith(key)):
+            key_id = int(self._suffix_keys[position])
+            if key_id not in key_ids:
+                key_ids.append(key_id)
+            position += 1
+        return [int(self.rows[key_id]) for key_id in key_ids]
+
+    def fuzzy_matches(self, query: str, limit: int = 10,
+                      min_similarity: float = MIN_FUZZY_SIMILARITY) -> List[Tuple[int, float]]:
+        """
+        Rows of titles sharing the most trigrams with the query.
+
+        Returns:
+            (row, similarity) pairs, most similar first, ties broken by row
+        """
+        grams = trigrams(search_key(query))
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not lists:
+            return []
+        key_ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+        similarity = shared / (len(grams) + self._gram_counts[key_ids] - shared)
+        keep = similarity >= min_similarity
+        key_ids, similarity = key_ids[keep], similarity[keep]
+        return [
+            (int(self.rows[key_ids[index]]), float(similarity[index]))
+            for index in top_k_rows(similarity, limit)
+        ]
+
+    def search(self, query: str, limit: int = 10) -> List[int]:
+        """Rows of up to limit titles matching the query: prefix matches, then fuzzy ones."""
+        rows = self.prefix_matches(query, limit)
+        if len(rows) < limit:
+            for row, _ in self.fuzzy_matches(query, limit):
+                if row not in rows:
+                    rows.append(row)
+                if len(rows) == limit:
+                    break
+        return rows
@@ -0,0 +1,75 @@
+"""
+Top-k selection shared by the recommenders.
+
+Every ranking in the recommenders is "highest score first, earlier item first
+on ties", the order a stable descending sort gives. These helpers produce that
+order without sorting everything: O(N + k log k) instead of O(N log N).
+"""
+from typing import Hashable, Iterable, List, Optional, Tuple, TypeVar
+import heapq
+import numpy as np
+
+T = TypeVar('T')
+
+
+def top_k_rows(scores: np.ndarray, count: int, excluded: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Rows with the highest scores, best first, skipping excluded rows.
+
+    Uses argpartition instead of a full sort; ties are broken by row order,
+    the same as a stable sort on descending score.
+
+    Args:
+        scores: Score per row
+        count: Number of rows to return
+        excluded: Optional boolean mask of rows that may not be returned
+
+    Returns:
+        Array of at most count row ids
+    """
+    if excluded is None:
+        candidates = np.arange(len(scores))
+    else:
+        candidates = (~excluded).nonzero()[0]
+    count = min(count, len(candidates))
+    if count <= 0:
+        return candidates[:0]
+
+    candidate_scores = scores[candidates]
+    if count < len(candidates):
+        # Everything above the k-th best score, plus the earliest rows tied with it
+        threshold = candidate_scores[np.argpartition(-candidate_scores, count - 1)[count - 1]]
+        above = (candidate_scores > threshold).nonzero()[0]
+        tied = (candidate_scores == threshold).nonzero()[0][:count - len(above)]
+        selected = np.concatenate([above, tied])
+    else:
+        selected = np.arange(len(candidates))
+
+    order = np.lexsort((selected, -candidate_scores[selected]))
+    return candidates[selected[order]]
+
+
+def top_k_items(items: Iterable[Tuple[T, float]], count: int,
+                excluded: Iterable[Hashable] = ()) -> List[Tuple[T, float]]:
+    """
+    (item, score) pairs with the highest scores, best first.
+
+    Uses a bounded heap; ties keep their iteration order, the same as
+    sorted(items, key=score, reverse=True)[:count].
+
+    Args:
+        items: Iterable of (item, score) pairs
+        count: Number of pairs to return
+        excluded: Items that may not be returned
+
+    Returns:
+        List of at most count (item, score) pairs
+    """
+    excluded = set(excluded)
+    if excluded:
+        items = (pair for pair in items if pair[0] not in excluded)
+    return heapq.nlargest(count, items, key=_score)
+
+
+def _score(pair: Tuple[T, float]) -> float:
+    return pair[1]
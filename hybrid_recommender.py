@@ -1,6 +1,7 @@
 from typing import Dict, List
 from netflix_recommender.recommender import ContentRecommender, UserBasedRecommender
 from netflix_recommender.data_manager import DataManager
+from netflix_recommender.topk import top_k_items
 
 
 class HybridRecommender:
@@ -11,14 +12,19 @@ class HybridRecommender:
 
     def get_recommendations(self, title: str, user_ratings: Dict[str, float], 
                           count: int) -> List[str]:
-        content_recommendations = self.content_recommender.find_similar_content(title, count)
-        user_recommendations = self.user_based_recommender.recommend_from_ratings(user_ratings, count)
+        # Neither the query title nor titles the user already rated are recommended
+        catalog_title = self.content_recommender.data_manager.find_title(title)
+        excluded = {title, catalog_title} | set(user_ratings)
+        # Ask each source for enough extra titles to still fill count after exclusions
+        candidate_count = count + len(excluded)
+        content_recommendations = self.content_recommender.find_similar_content(title, candidate_count)
+        user_recommendations = self.user_based_recommender.recommend_from_ratings(user_ratings, candidate_count)
         
         combined_scores = {}
-        for title, score in content_recommendations:
-            combined_scores[title] = score * 0.5
-        for title, score in user_recommendations:
-            combined_scores[title] = combined_scores.get(title, 0) + score * 0.5
+        for recommended_title, score in content_recommendations:
+            combined_scores[recommended_title] = score * 0.5
+        for recommended_title, score in user_recommendations:
+            combined_scores[recommended_title] = combined_scores.get(recommended_title, 0) + score * 0.5
                 
-        sorted_recommendations = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
-        return [title for title, _ in sorted_recommendations[:count]]
\ No newline at end of file
+        top_recommendations = top_k_items(combined_scores.items(), count, excluded)
+        return [recommended_title for recommended_title, _ in top_recommendations]
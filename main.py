@@ -41,10 +41,12 @@ def main():
             except ValueError:
                 print('Invalid input. Please enter an integer.')
         
-        recent_title = input(f'\nEnter a {last_watched_content} you have most recently watched: ').strip()
-        while recent_title not in data_manager.data['title'].values:
+        recent_title = data_manager.find_title(
+            input(f'\nEnter a {last_watched_content} you have most recently watched: ').strip())
+        while recent_title is None:
             print('Title not found')
-            recent_title = input(f'Enter a {last_watched_content} you have most recently watched: ').strip()
+            recent_title = data_manager.find_title(
+                input(f'Enter a {last_watched_content} you have most recently watched: ').strip())
 
         print('\nPlease wait while the system generates recommendations...')
         recommendations = hybrid_recommender.get_recommendations(recent_title, user_ratings, number_recommendations)
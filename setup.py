@@ -7,6 +7,7 @@ setup(
     install_requires=[
         'pandas',
         'numpy',
+        'scipy',
         'scikit-learn',
     ],
     author="Tony Trieu",
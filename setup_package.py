@@ -5,21 +5,43 @@ import shutil
 if not os.path.exists('netflix_recommender'):
     os.makedirs('netflix_recommender')
 
-# Files to move
+# Files to move: the recommenders and every backend module they import
 files = [
+    'catalog.py',
+    'catalog_cache.py',
     'data_manager.py',
+    'feature_index.py',
     'hybrid_recommender.py',
+    'instrumentation.py',
+    'lsh.py',
+    'neighbors.py',
+    'parallel_scoring.py',
     'recommender.py',
     'similarity.py',
+    'similarity_engines.py',
+    'text_column.py',
+    'title_index.py',
+    'title_search.py',
+    'topk.py',
     'user_interface.py',
 ]
 
+# Backend modules live in backend/; look there when they aren't in the current directory
+def find_file(file):
+    for directory in ['.', 'backend']:
+        path = os.path.join(directory, file)
+        if os.path.exists(path):
+            return path
+    return None
+
 # Move files
 for file in files:
-    if os.path.exists(file):
-        shutil.copy2(file, os.path.join('netflix_recommender', file))
+    path = find_file(file)
+    if path is not None:
+        shutil.copy2(path, os.path.join('netflix_recommender', file))
 
 # Move data files
 for data_file in ['movies.csv', 'tv_shows.csv']:
-    if os.path.exists(data_file):
-        shutil.copy2(data_file, os.path.join('netflix_recommender', data_file))
+    path = find_file(data_file)
+    if path is not None:
+        shutil.copy2(path, os.path.join('netflix_recommender', data_file))
@@ -21,7 +21,9 @@ class UserInterface:
                 self.handle_search(title[7:])
                 continue
             
-            if title in self.data_manager.data['title'].values:
+            catalog_title = self.data_manager.find_title(title)
+            if catalog_title is not None:
+                title = catalog_title
                 rating = self.get_rating(title)
                 if rating:
                     ratings[title] = rating